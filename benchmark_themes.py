@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Stage-level benchmarks for generate_themes.py.
+
+Each generator stage is timed on its own against the real template and against padded copies
+of it, over synthetic THEME_SPECS catalogs. Results are written as a JSON report with
+percentiles, and --compare flags stages that regressed against a saved baseline report.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import generate_themes as gen
+
+# ─────────────────────────────────────────────────────────────
+#  CONFIGURATION
+# ─────────────────────────────────────────────────────────────
+DEFAULT_CATALOG_SIZES = "7,1000,50000"
+DEFAULT_PADDING       = "1,10"
+DEFAULT_REPEAT        = 20
+DEFAULT_THRESHOLD     = 0.10
+DEFAULT_MIN_DELTA_MS  = 0.02
+MIN_COMPARE_SAMPLES   = 20
+REPORT_VERSION        = 1
+PERCENTILES           = (50, 90, 99)
+
+TEMPLATE_STAGES = ("read_template", "parse_jsonc", "compile_template")
+VARIANT_STAGES = (
+    "build_surface_roles",
+    "surface_lut_lookup",
+    "build_role_palette",
+    "render_template",
+    "validate_theme",
+    "preview_styles",
+    "serialize",
+)
+
+# ─────────────────────────────────────────────────────────────
+#  WORKLOADS
+# ─────────────────────────────────────────────────────────────
+def synthetic_catalog(size, seed=0):
+    """
+    Yield `size` (name, spec, light_accent) entries.
+
+    The first entries are the real THEME_SPECS; the rest get random surface seeds and accents
+    drawn from the real specs, so the accent mix stays realistic.
+    """
+    rng = random.Random(seed)
+    real = list(gen.THEME_SPECS.items())
+    accent_keys = [key for key in real[0][1] if key != "surface_seed"]
+    accent_pool = {key: [spec[key] for _, spec in real if key in spec] for key in accent_keys}
+    light_pool = list(gen.LIGHT_ACCENT_COLORS.values())
+
+    for index in range(size):
+        if index < len(real):
+            name, spec = real[index]
+            yield name, spec, gen.LIGHT_ACCENT_COLORS.get(name)
+            continue
+        spec = {
+            "surface_seed": gen.hsl_to_hex(rng.uniform(0, 360), rng.uniform(5, 60), rng.uniform(10, 35)),
+        }
+        for key in accent_keys:
+            spec[key] = rng.choice(accent_pool[key])
+        yield f"Synthetic{index}", spec, rng.choice(light_pool)
+
+def padded_template(source_str, factor):
+    """Return template text roughly `factor` times the size of the original."""
+    if factor <= 1:
+        return source_str
+    data, comments = gen.parse_jsonc(source_str, keep_comments=True)
+    colors = dict(data["colors"])
+    for copy in range(1, factor):
+        for key, value in data["colors"].items():
+            colors[f"{key}.pad{copy}"] = value
+    data["colors"] = colors
+    data["tokenColors"] = data["tokenColors"] * factor
+    return gen.dump_jsonc(data, comments)
+
+# ─────────────────────────────────────────────────────────────
+#  MEASUREMENT
+# ─────────────────────────────────────────────────────────────
+def percentile(sorted_samples, rank):
+    if not sorted_samples:
+        return 0.0
+    index = max(0, math.ceil(rank / 100 * len(sorted_samples)) - 1)
+    return sorted_samples[index]
+
+def summarize(samples):
+    ordered = sorted(samples)
+    summary = {
+        "count": len(ordered),
+        "total_ms": sum(ordered) * 1000,
+        "mean_ms": (sum(ordered) / len(ordered) * 1000) if ordered else 0.0,
+        "max_ms": (ordered[-1] * 1000) if ordered else 0.0,
+    }
+    for rank in PERCENTILES:
+        summary[f"p{rank}_ms"] = percentile(ordered, rank) * 1000
+    return summary
+
+def timed(samples, stage, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    samples[stage].append(time.perf_counter() - start)
+    return result
+
+def surface_lut_lookup(surface_seed):
+    hue, saturation, _ = gen.hex_to_hsl(surface_seed)
+    saturation = min(saturation, gen.RUBY_SURFACE_MODEL["deep_saturation_cap"])
+    return gen.surface_lut_roles(gen.surface_lut_cell(hue, saturation))
+
+def run_workload(template_path, source_str, catalog_size, repeat, output_dir):
+    gen.clear_color_caches()
+    samples = {stage: [] for stage in TEMPLATE_STAGES + VARIANT_STAGES}
+
+    for _ in range(repeat):
+        with open(template_path, "r") as f:
+            timed(samples, "read_template", f.read)
+        data = timed(samples, "parse_jsonc", gen.parse_jsonc, source_str)
+        plan = timed(samples, "compile_template", gen.compile_template, data)
+
+    failures = 0
+    preview_tokens = 0
+    output_path = os.path.join(output_dir, "theme.json")
+    encoder = gen.output_encoder()
+    # Small catalogs are run several times so every variant stage gets at least `repeat` samples.
+    passes = max(1, math.ceil(repeat / catalog_size))
+    entries = (entry for _ in range(passes) for entry in synthetic_catalog(catalog_size))
+    for name, spec, light_accent in entries:
+        label = f"{gen.DISPLAY_NAME} {name}"
+        try:
+            timed(samples, "build_surface_roles", gen.build_surface_roles, spec["surface_seed"])
+            if gen.SURFACE_LUT is not None:
+                timed(samples, "surface_lut_lookup", surface_lut_lookup, spec["surface_seed"])
+            palette = timed(samples, "build_role_palette", gen.build_role_palette, spec)
+        except ValueError:
+            failures += 1
+            continue
+        theme_data = timed(samples, "render_template", gen.render_template, plan, palette)
+        gen.apply_theme_overrides(theme_data, label, light_accent)
+        try:
+            timed(samples, "validate_theme", gen.validate_theme, label, theme_data)
+        except ValueError:
+            failures += 1
+        _, count = timed(samples, "preview_styles", lambda: gen.style_samples(gen.preview_styler(theme_data)))
+        preview_tokens += count
+        timed(samples, "serialize", gen.stream_json, theme_data, output_path, encoder)
+
+    return {
+        "catalog_size": catalog_size,
+        "template_bytes": len(source_str.encode("utf-8")),
+        "failures": failures,
+        "preview_tokens_per_s": preview_tokens / max(sum(samples["preview_styles"]), 1e-9),
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+        "color_cache": gen.color_cache_stats(),
+    }
+
+def run_benchmarks(catalog_sizes, padding, repeat):
+    script_dir = os.path.dirname(os.path.abspath(gen.__file__))
+    template_path = os.path.join(script_dir, "themes", "color-sea-template.json")
+    if gen.use_surface_lut(gen.surface_lut_path(script_dir)) is None:
+        print("  (no current surface lookup table; build it with generate_themes.py --build-surface-lut)", file=sys.stderr)
+    with open(template_path, "r") as f:
+        source_str = f.read()
+
+    report = {
+        "version": REPORT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "workloads": {},
+    }
+    with tempfile.TemporaryDirectory() as output_dir:
+        for factor in padding:
+            padded_str = padded_template(source_str, factor)
+            padded_path = template_path
+            if factor > 1:
+                padded_path = os.path.join(output_dir, f"template-x{factor}.json")
+                with open(padded_path, "w") as f:
+                    f.write(padded_str)
+            for size in catalog_sizes:
+                workload = f"template-x{factor}/catalog-{size}"
+                print(f"  → {workload}", file=sys.stderr)
+                report["workloads"][workload] = run_workload(padded_path, padded_str, size, repeat, output_dir)
+    return report
+
+# ─────────────────────────────────────────────────────────────
+#  REPORTING
+# ─────────────────────────────────────────────────────────────
+def compare_reports(baseline, current, threshold, min_delta_ms=DEFAULT_MIN_DELTA_MS, metric="p50_ms"):
+    """
+    Return (workload, stage, baseline, current, change) rows for stages slower than threshold.
+
+    A stage only counts when both reports have MIN_COMPARE_SAMPLES samples of it, it slowed by
+    more than min_delta_ms as well, and its new median is above the baseline's p90, so timer
+    noise on sub-millisecond stages and within a stage's usual spread is not flagged.
+    """
+    regressions = []
+    for workload, result in current["workloads"].items():
+        base_result = baseline.get("workloads", {}).get(workload)
+        if not base_result:
+            continue
+        for stage, summary in result["stages"].items():
+            base_summary = base_result["stages"].get(stage)
+            if not base_summary or base_summary[metric] <= 0:
+                continue
+            if min(base_summary["count"], summary["count"]) < MIN_COMPARE_SAMPLES:
+                continue
+            change = summary[metric] / base_summary[metric] - 1
+            if (
+                change > threshold
+                and summary[metric] - base_summary[metric] > min_delta_ms
+                and summary[metric] > base_summary["p90_ms"]
+            ):
+                regressions.append((workload, stage, base_summary[metric], summary[metric], change))
+    return regressions
+
+def print_table(report, file=sys.stderr):
+    for workload, result in report["workloads"].items():
+        print(
+            f"\n📊 {workload} ({result['template_bytes']} bytes, {result['failures']} failed, "
+            f"{result['preview_tokens_per_s']:,.0f} preview tokens/s)",
+            file=file,
+        )
+        print(f"   {'stage':<22}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'total ms':>12}", file=file)
+        for stage, summary in result["stages"].items():
+            print(
+                f"   {stage:<22}{summary['count']:>8}{summary['p50_ms']:>10.4f}"
+                f"{summary['p90_ms']:>10.4f}{summary['p99_ms']:>10.4f}{summary['total_ms']:>12.1f}",
+                file=file,
+            )
+
+def parse_sizes(text):
+    return [int(part) for part in text.split(",") if part.strip()]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each generate_themes.py stage.")
+    parser.add_argument("--sizes", default=DEFAULT_CATALOG_SIZES, help=f"catalog sizes (default {DEFAULT_CATALOG_SIZES})")
+    parser.add_argument("--padding", default=DEFAULT_PADDING, help=f"template size factors (default {DEFAULT_PADDING})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="template stage repetitions per workload")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a saved report")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"relative p50 slowdown counted as a regression (default {DEFAULT_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=DEFAULT_MIN_DELTA_MS,
+        help=f"absolute p50 slowdown a regression must also exceed (default {DEFAULT_MIN_DELTA_MS} ms)",
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("⏱️  Benchmarking generator stages...", file=sys.stderr)
+    report = run_benchmarks(parse_sizes(args.sizes), parse_sizes(args.padding), args.repeat)
+    print_table(report)
+
+    content = json.dumps(report, indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(content)
+        print(f"\n💾 Wrote {args.output}", file=sys.stderr)
+    else:
+        sys.stdout.write(content)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} stage(s) regressed more than {args.threshold:.0%} and {args.min_delta_ms} ms:", file=sys.stderr)
+            for workload, stage, before, after, change in regressions:
+                print(f"   {workload} {stage}: {before:.4f} → {after:.4f} ms p50 (+{change:.0%})", file=sys.stderr)
+            sys.exit(1)
+        print(f"\n✅ No stage regressed more than {args.threshold:.0%} and {args.min_delta_ms} ms.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
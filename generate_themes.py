@@ -5,11 +5,25 @@ Generate VS Code theme variants from a neutral template.
 The generator keeps the shared Color Sea surface relationships while allowing each variant to define its own accent roles.
 """
 
+import argparse
+import hashlib
+import array
 import json
 import os
 import re
+import sys
+import time
 import colorsys
 import math
+import mmap
+import struct
+import fnmatch
+import heapq
+import itertools
+import pickle
+import random
+from collections import deque
+from functools import lru_cache
 
 # ─────────────────────────────────────────────────────────────
 #  CONFIGURATION
@@ -18,6 +32,17 @@ PUBLISHER_NAME = "danesed"
 EXTENSION_NAME = "color-sea"
 DISPLAY_NAME   = "Color Sea"
 REPO_URL       = "https://github.com/danesed/colorsea-vscode"
+CACHE_DIRNAME  = ".theme-cache"
+TEMPLATE_STEM  = "color-sea-template"
+CACHE_VERSION  = 1
+STATE_VERSION  = 1
+STATE_PALETTE_LIMIT = 4096
+COLOR_CACHE_SIZE = 4096
+STREAM_BUFFER_SIZE = 8192
+OUTPUT_FORMATS = {
+    "pretty": {"indent": 2},
+    "compact": {"separators": (",", ":")},
+}
 
 # ─────────────────────────────────────────────────────────────
 #  TEMPLATE COLOR ROLE MAP
@@ -43,16 +68,14 @@ SOURCE_COLORS = {
 #  HELPER FUNCTIONS
 # ─────────────────────────────────────────────────────────────
 def hex_to_rgb(h):
-    h = h.lstrip("#")
-    return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
+    packed = to_packed(h)
+    return (packed >> 16, (packed >> 8) & 0xFF, packed & 0xFF)
 
 def rgb_to_hex(r, g, b):
     return "#{:02x}{:02x}{:02x}".format(int(round(r)), int(round(g)), int(round(b)))
 
 def hex_to_hsl(h):
-    r, g, b = [x / 255.0 for x in hex_to_rgb(h)]
-    hue, lig, sat = colorsys.rgb_to_hls(r, g, b)
-    return (hue * 360, sat * 100, lig * 100)
+    return packed_hsl(to_packed(h))
 
 def hsl_to_hex(h, s, l):
     h_n, s_n, l_n = h / 360.0, s / 100.0, l / 100.0
@@ -86,23 +109,20 @@ def srgb_channel_to_linear(channel):
         return value / 12.92
     return ((value + 0.055) / 1.055) ** 2.4
 
-def relative_luminance(hex_color):
-    r, g, b = hex_to_rgb(hex_color)
-    red = srgb_channel_to_linear(r)
-    green = srgb_channel_to_linear(g)
-    blue = srgb_channel_to_linear(b)
-    return 0.2126 * red + 0.7152 * green + 0.0722 * blue
+def linear_from_rgb(rgb):
+    red, green, blue = rgb
+    return (
+        srgb_channel_to_linear(red),
+        srgb_channel_to_linear(green),
+        srgb_channel_to_linear(blue),
+    )
 
-def contrast_ratio(color_a, color_b):
-    lighter = max(relative_luminance(color_a), relative_luminance(color_b))
-    darker = min(relative_luminance(color_a), relative_luminance(color_b))
-    return (lighter + 0.05) / (darker + 0.05)
+def luminance_from_linear(linear):
+    red, green, blue = linear
+    return 0.2126 * red + 0.7152 * green + 0.0722 * blue
 
-def rgb_to_oklab(hex_color):
-    red, green, blue = hex_to_rgb(hex_color)
-    red = srgb_channel_to_linear(red)
-    green = srgb_channel_to_linear(green)
-    blue = srgb_channel_to_linear(blue)
+def oklab_from_linear(linear):
+    red, green, blue = linear
 
     l = 0.4122214708 * red + 0.5363325363 * green + 0.0514459929 * blue
     m = 0.2119034982 * red + 0.6806995451 * green + 0.1073969566 * blue
@@ -118,9 +138,18 @@ def rgb_to_oklab(hex_color):
         0.0259040371 * l_root + 0.7827717662 * m_root - 0.8086757660 * s_root,
     )
 
-def oklab_delta(color_a, color_b):
-    light_a, a_a, b_a = rgb_to_oklab(color_a)
-    light_b, a_b, b_b = rgb_to_oklab(color_b)
+def oklch_from_oklab(lab):
+    light, a, b = lab
+    return (light, (a * a + b * b) ** 0.5, math.degrees(math.atan2(b, a)) % 360)
+
+def contrast_from_luminance(luminance_a, luminance_b):
+    lighter = max(luminance_a, luminance_b)
+    darker = min(luminance_a, luminance_b)
+    return (lighter + 0.05) / (darker + 0.05)
+
+def oklab_delta_from_labs(lab_a, lab_b):
+    light_a, a_a, b_a = lab_a
+    light_b, a_b, b_b = lab_b
     chroma_a = (a_a * a_a + b_a * b_a) ** 0.5
     chroma_b = (a_b * a_b + b_b * b_b) ** 0.5
     hue_a = math.atan2(b_a, a_a)
@@ -134,6 +163,214 @@ def oklab_delta(color_a, color_b):
         diff * 180 / math.pi,
     )
 
+# ─────────────────────────────────────────────────────────────
+#  PACKED COLOR VALUES
+# ─────────────────────────────────────────────────────────────
+SRGB_TO_LINEAR = tuple(srgb_channel_to_linear(channel) for channel in range(256))
+
+class Color:
+    """An sRGB color packed into a 0xRRGGBB int, with an optional 0-255 alpha."""
+
+    __slots__ = ("packed", "alpha")
+
+    def __init__(self, packed, alpha=None):
+        self.packed = packed
+        self.alpha = alpha
+
+    @classmethod
+    def from_hex(cls, text):
+        digits = text.lstrip("#")
+        alpha = int(digits[6:8], 16) if len(digits) >= 8 else None
+        return cls(int(digits[:6], 16), alpha)
+
+    @property
+    def rgb(self):
+        return (self.packed >> 16, (self.packed >> 8) & 0xFF, self.packed & 0xFF)
+
+    @property
+    def hex(self):
+        suffix = "" if self.alpha is None else f"{self.alpha:02x}"
+        return f"#{self.packed:06x}{suffix}"
+
+    def __eq__(self, other):
+        return isinstance(other, Color) and (self.packed, self.alpha) == (other.packed, other.alpha)
+
+    def __hash__(self):
+        return hash((self.packed, self.alpha))
+
+    def __repr__(self):
+        return f"Color({self.hex!r})"
+
+    def __str__(self):
+        return self.hex
+
+def to_packed(color):
+    if isinstance(color, Color):
+        return color.packed
+    return int(color.lstrip("#")[:6], 16)
+
+@lru_cache(maxsize=COLOR_CACHE_SIZE)
+def packed_linear(packed):
+    return (
+        SRGB_TO_LINEAR[packed >> 16],
+        SRGB_TO_LINEAR[(packed >> 8) & 0xFF],
+        SRGB_TO_LINEAR[packed & 0xFF],
+    )
+
+@lru_cache(maxsize=COLOR_CACHE_SIZE)
+def packed_luminance(packed):
+    return luminance_from_linear(packed_linear(packed))
+
+@lru_cache(maxsize=COLOR_CACHE_SIZE)
+def packed_oklab(packed):
+    return oklab_from_linear(packed_linear(packed))
+
+@lru_cache(maxsize=COLOR_CACHE_SIZE)
+def packed_hsl(packed):
+    hue, lig, sat = colorsys.rgb_to_hls(
+        (packed >> 16) / 255.0,
+        ((packed >> 8) & 0xFF) / 255.0,
+        (packed & 0xFF) / 255.0,
+    )
+    return (hue * 360, sat * 100, lig * 100)
+
+COLOR_CACHES = {
+    "linear": packed_linear,
+    "luminance": packed_luminance,
+    "oklab": packed_oklab,
+    "hsl": packed_hsl,
+}
+
+def color_cache_stats():
+    stats = {}
+    for name, cached in COLOR_CACHES.items():
+        info = cached.cache_info()
+        stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+    return stats
+
+def clear_color_caches():
+    for cached in COLOR_CACHES.values():
+        cached.cache_clear()
+
+def relative_luminance(hex_color):
+    return packed_luminance(to_packed(hex_color))
+
+def contrast_ratio(color_a, color_b):
+    return contrast_from_luminance(relative_luminance(color_a), relative_luminance(color_b))
+
+def rgb_to_oklab(hex_color):
+    return packed_oklab(to_packed(hex_color))
+
+def oklab_delta(color_a, color_b):
+    return oklab_delta_from_labs(rgb_to_oklab(color_a), rgb_to_oklab(color_b))
+
+# ─────────────────────────────────────────────────────────────
+#  BATCH COLOR KERNEL
+# ─────────────────────────────────────────────────────────────
+COLOR_FIELDS = {
+    "srgb": lambda packed: (packed >> 16, (packed >> 8) & 0xFF, packed & 0xFF),
+    "linear": packed_linear,
+    "hsl": packed_hsl,
+    "luminance": packed_luminance,
+    "oklab": packed_oklab,
+    "oklch": lambda packed: oklch_from_oklab(packed_oklab(packed)),
+}
+
+def packed_hue(packed):
+    return packed_hsl(packed)[0]
+
+# metric: (per-color conversion, pairwise measure)
+COMPARE_METRICS = {
+    "contrast": (packed_luminance, contrast_from_luminance),
+    "oklab_delta": (packed_oklab, oklab_delta_from_labs),
+    "hue_distance": (packed_hue, hue_distance),
+}
+
+def convert_colors(hex_colors, fields=tuple(COLOR_FIELDS)):
+    """
+    Convert a sequence of hex colors or Color values in one call, computing only the requested
+    COLOR_FIELDS (alpha ignored). The returned lists line up index-for-index with the input.
+    """
+    keys = [to_packed(color) for color in hex_colors]
+    return {field: list(map(COLOR_FIELDS[field], keys)) for field in fields}
+
+def broadcast_pairs(colors_a, colors_b):
+    colors_a = [colors_a] if isinstance(colors_a, (str, Color)) else list(colors_a)
+    colors_b = [colors_b] if isinstance(colors_b, (str, Color)) else list(colors_b)
+    if len(colors_a) == 1 and len(colors_b) > 1:
+        colors_a = colors_a * len(colors_b)
+    elif len(colors_b) == 1 and len(colors_a) > 1:
+        colors_b = colors_b * len(colors_a)
+    if len(colors_a) != len(colors_b):
+        raise ValueError(f"cannot pair {len(colors_a)} colors with {len(colors_b)} colors")
+    return colors_a, colors_b
+
+def compare_colors(colors_a, colors_b, metrics=tuple(COMPARE_METRICS)):
+    """
+    Pairwise contrast, OKLab deltas and HSL hue distances between two color sequences; only
+    the requested COMPARE_METRICS are computed.
+
+    Either side may be a single color, which is compared against every color on the other side.
+    """
+    colors_a, colors_b = broadcast_pairs(colors_a, colors_b)
+    keys_a = [to_packed(color) for color in colors_a]
+    keys_b = [to_packed(color) for color in colors_b]
+    comparison = {}
+    for metric in metrics:
+        convert, measure = COMPARE_METRICS[metric]
+        comparison[metric] = list(map(measure, map(convert, keys_a), map(convert, keys_b)))
+    return comparison
+
+def batch_contrast_ratio(colors_a, colors_b):
+    return compare_colors(colors_a, colors_b, ("contrast",))["contrast"]
+
+def batch_oklab_delta(colors_a, colors_b):
+    return compare_colors(colors_a, colors_b, ("oklab_delta",))["oklab_delta"]
+
+# Full-severity dichromacy simulation in linear RGB (Machado, Oliveira & Fernandes 2009).
+CVD_MATRICES = {
+    "protan": (
+        (0.152286, 1.052583, -0.204868),
+        (0.114503, 0.786281, 0.099216),
+        (-0.003882, -0.048116, 1.051998),
+    ),
+    "deutan": (
+        (0.367322, 0.860646, -0.227968),
+        (0.280085, 0.672501, 0.047413),
+        (-0.011820, 0.042940, 0.968881),
+    ),
+    "tritan": (
+        (1.255528, -0.076749, -0.178779),
+        (-0.078411, 0.930809, 0.147602),
+        (0.004733, 0.691367, 0.303900),
+    ),
+}
+
+def simulate_cvd(hex_colors):
+    """
+    Simulate a sequence of colors under every CVD_MATRICES deficiency in one pass.
+
+    Each distinct color's linear RGB is multiplied by every matrix once and clamped to gamut.
+    Returns {deficiency: {"luminance": [...], "oklab": [...]}} lined up with the input.
+    """
+    keys = [to_packed(color) for color in hex_colors]
+    distinct = list(dict.fromkeys(keys))
+    linear = [packed_linear(key) for key in distinct]
+    simulated = {}
+    for deficiency, (row_r, row_g, row_b) in CVD_MATRICES.items():
+        rows = {}
+        for key, (red, green, blue) in zip(distinct, linear):
+            channels = tuple(
+                min(1.0, max(0.0, row[0] * red + row[1] * green + row[2] * blue))
+                for row in (row_r, row_g, row_b)
+            )
+            rows[key] = (luminance_from_linear(channels), oklab_from_linear(channels))
+        simulated[deficiency] = {
+            "luminance": [rows[key][0] for key in keys],
+            "oklab": [rows[key][1] for key in keys],
+        }
+    return simulated
+
 # ─────────────────────────────────────────────────────────────
 #  ROLE MODEL + PALETTES
 # ─────────────────────────────────────────────────────────────
@@ -265,6 +502,157 @@ LIGHT_ACCENT_COLORS = {
     "Gray": "#D8E8FF",
 }
 
+# Light and high-contrast modes re-solve the dark palette's hues and saturations at these
+# lightnesses; BG_DEEP and BG_MID are then tuned against BG_EDITOR like the dark surfaces.
+MODE_SURFACE_MODELS = {
+    "light": {"editor_lightness": 97.0, "deep_lightness": 93.0, "mid_lightness": 86.0, "saturation_scale": 0.5},
+    "hc": {"editor_lightness": 5.0, "deep_lightness": 3.0, "mid_lightness": 22.0, "saturation_scale": 1.0},
+}
+
+LIGHT_SURFACE_VALIDATION = {
+    "sidebar_editor_ratio": (1.06, 1.11),
+    "sidebar_editor_dlight": (0.015, 0.04),
+    "sidebar_editor_dchroma_max": 0.02,
+    "sidebar_editor_dhue_max": 12.0,
+    "editor_mid_ratio": (1.25, 1.45),
+    "editor_mid_dlight": (0.05, 0.12),
+    "editor_mid_dchroma": (0.02, 0.07),
+    "editor_mid_dhue_max": 16.0,
+    "selection_margin": 0.12,
+}
+
+# Near black, a small luminance step is a large OKLab lightness step and 8-bit rounding
+# swings the hue, so high-contrast surfaces get wider lightness and hue allowances.
+HC_SURFACE_VALIDATION = {
+    **SURFACE_VALIDATION,
+    "sidebar_editor_dlight": (0.02, 0.12),
+    "sidebar_editor_dhue_max": 45.0,
+    "editor_mid_dlight": (0.13, 0.25),
+    "editor_mid_dhue_max": 12.0,
+}
+
+HC_TEXT_RATIOS = {
+    "foreground": 7.0,
+    "editor.foreground": 10.0,
+    "descriptionForeground": 12.0,
+    "button.background": 4.5,
+    "editorWarning.foreground": 7.0,
+    "editorInfo.foreground": 7.0,
+    "editorError.foreground": 7.0,
+}
+
+# Every TEXT_VALIDATION key needs a high-contrast ratio; a missing one fails at import.
+HC_TEXT_VALIDATION = {key: {**rule, "ratio": HC_TEXT_RATIOS[key]} for key, rule in TEXT_VALIDATION.items()}
+
+# Accent role -> the TEXT_VALIDATION key whose ratio it is solved to in light/hc modes.
+ACCENT_CONTRAST_KEYS = {
+    "ACCENT_PRI": "button.background",
+    "ACCENT_SEC": "editorWarning.foreground",
+    "ACCENT_TER": "editorInfo.foreground",
+    "ACCENT_QUA": "editorInfo.foreground",
+    "ACCENT_OP": "editorInfo.foreground",
+    "ERROR": "editorError.foreground",
+}
+
+MODES = {
+    "dark": {
+        "type": "dark",
+        "uiTheme": "vs-dark",
+        "name_suffix": "",
+        "file_suffix": "",
+        "surface_validation": SURFACE_VALIDATION,
+        "text_validation": TEXT_VALIDATION,
+    },
+    "light": {
+        "type": "light",
+        "uiTheme": "vs",
+        "name_suffix": " Light",
+        "file_suffix": "-light",
+        "surface_validation": LIGHT_SURFACE_VALIDATION,
+        "text_validation": TEXT_VALIDATION,
+    },
+    "hc": {
+        "type": "hc",
+        "uiTheme": "hc-black",
+        "name_suffix": " High Contrast",
+        "file_suffix": "-hc",
+        "surface_validation": HC_SURFACE_VALIDATION,
+        "text_validation": HC_TEXT_VALIDATION,
+    },
+}
+
+
+# ─────────────────────────────────────────────────────────────
+#  PROFILING
+# ─────────────────────────────────────────────────────────────
+ACTIVE_PROFILE = None
+
+def start_profile():
+    global ACTIVE_PROFILE
+    ACTIVE_PROFILE = {
+        "started": time.perf_counter(),
+        "stages_ms": {},
+        "solvers": [],
+        "conversions": color_cache_stats(),
+    }
+
+def finish_profile():
+    global ACTIVE_PROFILE
+    profile, ACTIVE_PROFILE = ACTIVE_PROFILE, None
+    before, after = profile.pop("conversions"), color_cache_stats()
+    profile["wall_ms"] = (time.perf_counter() - profile.pop("started")) * 1000
+    profile["conversions"] = {
+        name: {
+            "hits": after[name]["hits"] - before[name]["hits"],
+            "misses": after[name]["misses"] - before[name]["misses"],
+        }
+        for name in after
+    }
+    return profile
+
+def profiled(stage, function, *args, **kwargs):
+    if ACTIVE_PROFILE is None:
+        return function(*args, **kwargs)
+    start = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        stages = ACTIVE_PROFILE["stages_ms"]
+        stages[stage] = stages.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+def record_solver(solver, label, solution):
+    if ACTIVE_PROFILE is None:
+        return
+    ACTIVE_PROFILE["solvers"].append({
+        "solver": solver,
+        "role": label,
+        "exit": solution["exit"],
+        "iterations": solution.get("iterations", 1),
+        "evaluations": solution["evaluations"],
+    })
+
+def print_profile_table(results):
+    stages = []
+    for result in results:
+        for stage in result["profile"]["stages_ms"]:
+            if stage not in stages:
+                stages.append(stage)
+    print("\n⏱️  Profile (ms):")
+    print("   " + f"{'variant':<12}" + "".join(f"{stage:>11}" for stage in stages) + f"{'total':>11}{'conv':>7}")
+    for result in results:
+        profile = result["profile"]
+        conversions = sum(stats["misses"] for stats in profile["conversions"].values())
+        print(
+            "   "
+            + f"{result['name']:<12}"
+            + "".join(f"{profile['stages_ms'].get(stage, 0.0):>11.3f}" for stage in stages)
+            + f"{profile['wall_ms']:>11.3f}{conversions:>7}"
+        )
+        for solver in profile["solvers"]:
+            print(
+                f"     {solver['role'] or '-':<10} {solver['solver']:<22} {solver['exit']:<12}"
+                f"iterations={solver['iterations']:<3} evaluations={solver['evaluations']}"
+            )
 
 # ─────────────────────────────────────────────────────────────
 #  GENERATION LOGIC
@@ -272,7 +660,15 @@ LIGHT_ACCENT_COLORS = {
 def build_surface_roles(surface_seed):
     surface_hue, surface_saturation, _ = hex_to_hsl(surface_seed)
     surface_saturation = min(surface_saturation, RUBY_SURFACE_MODEL["deep_saturation_cap"])
-
+    if SURFACE_LUT is not None:
+        # Bit-exact only: a seed on the table grid has exactly the inputs its cell was solved for.
+        cell = surface_lut_cell(surface_hue, surface_saturation, exact=True)
+        surfaces = None if cell is None else surface_lut_roles(cell)
+        if surfaces is not None:
+            return surfaces
+    return solve_surface_roles(surface_hue, surface_saturation)
+
+def solve_surface_roles(surface_hue, surface_saturation):
     bg_deep = hsl_to_hex(
         surface_hue,
         surface_saturation,
@@ -283,26 +679,20 @@ def build_surface_roles(surface_seed):
         clamp(surface_saturation + RUBY_SURFACE_MODEL["editor_saturation_delta"], 0, 100),
         RUBY_SURFACE_MODEL["editor_lightness"],
     )
-    bg_mid = hsl_to_hex(
-        shift_hue(surface_hue, RUBY_SURFACE_MODEL["mid_hue_shift"]),
-        clamp(surface_saturation + RUBY_SURFACE_MODEL["mid_saturation_delta"], 0, 100),
-        RUBY_SURFACE_MODEL["mid_lightness"],
-    )
     bg_editor = tune_surface_contrast(
         bg_editor,
         bg_deep,
         *SURFACE_VALIDATION["sidebar_editor_ratio"],
-    )
-    bg_mid = tune_surface_contrast(
-        bg_mid,
-        bg_editor,
-        *SURFACE_VALIDATION["editor_mid_ratio"],
+        label="BG_EDITOR",
     )
     bg_mid = tune_surface_chroma(
-        bg_mid,
+        shift_hue(surface_hue, RUBY_SURFACE_MODEL["mid_hue_shift"]),
+        clamp(surface_saturation + RUBY_SURFACE_MODEL["mid_saturation_delta"], 0, 100),
+        RUBY_SURFACE_MODEL["mid_lightness"],
         bg_editor,
-        SURFACE_VALIDATION["editor_mid_dchroma"][1],
-        *SURFACE_VALIDATION["editor_mid_ratio"],
+        SURFACE_VALIDATION["editor_mid_dchroma"],
+        SURFACE_VALIDATION["editor_mid_ratio"],
+        label="BG_MID",
     )
 
     return {
@@ -322,57 +712,311 @@ def derive_neutral_role(bg_editor_hex, role_name):
         role_model["lightness"],
     )
 
-def lift_until_contrast(color_hex, background_hex, minimum_ratio):
-    hue, saturation, lightness = hex_to_hsl(color_hex)
-    while contrast_ratio(color_hex, background_hex) < minimum_ratio and lightness < 96:
-        lightness += 1
-        color_hex = hsl_to_hex(hue, saturation, lightness)
-    return color_hex
-
-def tune_surface_contrast(color_hex, anchor_hex, minimum_ratio, maximum_ratio):
-    hue, saturation, lightness = hex_to_hsl(color_hex)
-    for _ in range(200):
-        ratio = contrast_ratio(color_hex, anchor_hex)
-        if minimum_ratio <= ratio <= maximum_ratio:
+LIGHTNESS_SEARCH_RANGE = (0, 96)
+HSL_SEARCH_STEP = 0.25
+HSL_TOLERANCE = 1 / 64
+CHROMA_FIXUP_LIMIT = 8
+
+def linear_from_hsl(hue, saturation, lightness):
+    red, green, blue = colorsys.hls_to_rgb(hue / 360.0, lightness / 100.0, saturation / 100.0)
+    return linear_from_rgb((red * 255, green * 255, blue * 255))
+
+def hsl_luminance(hue, saturation, lightness, quantize=True):
+    if quantize:
+        return relative_luminance(hsl_to_hex(hue, saturation, lightness))
+    return luminance_from_linear(linear_from_hsl(hue, saturation, lightness))
+
+def contrast_luminance_windows(anchor_luminance, minimum_ratio, maximum_ratio):
+    anchor_offset = anchor_luminance + 0.05
+    lighter = (anchor_offset * minimum_ratio - 0.05, min(1.0, anchor_offset * maximum_ratio - 0.05))
+    darker = (max(0.0, anchor_offset / maximum_ratio - 0.05), anchor_offset / minimum_ratio - 0.05)
+    return [window for window in (lighter, darker) if window[0] <= window[1]]
+
+def search_hsl_channel(predicate, start, limit):
+    """
+    Return the HSL channel value closest to start (toward limit) where a monotonic predicate
+    first holds, or None. Gallops outward in doubling steps, then bisects the final bracket.
+    """
+    direction = 1 if limit >= start else -1
+    failing = start
+    distance = HSL_SEARCH_STEP
+    while True:
+        candidate = start + direction * distance
+        if direction * (candidate - limit) >= 0:
+            candidate = limit
+        if predicate(candidate):
             break
-        if ratio < minimum_ratio and lightness < 96:
-            lightness += 0.25
-        elif ratio > maximum_ratio and lightness > 0:
-            lightness -= 0.25
+        if candidate == limit:
+            return None
+        failing = candidate
+        distance *= 2
+
+    passing = candidate
+    while abs(passing - failing) > HSL_TOLERANCE:
+        middle = (passing + failing) / 2
+        if predicate(middle):
+            passing = middle
         else:
-            break
-        color_hex = hsl_to_hex(hue, saturation, lightness)
-    return color_hex
+            failing = middle
+    return passing
+
+def solve_lightness(
+    hue,
+    saturation,
+    lightness,
+    anchor_luminance,
+    minimum_ratio,
+    maximum_ratio=math.inf,
+    lightness_range=LIGHTNESS_SEARCH_RANGE,
+    quantize=True,
+):
+    """
+    Find the HSL lightness closest to the given one that puts the contrast against an anchor
+    luminance inside minimum_ratio..maximum_ratio, keeping hue and saturation fixed.
+
+    Luminance is monotonic in HSL lightness, so the ratio range maps analytically onto one
+    luminance window on each side of the anchor and only the window edges have to be searched.
+    The window on the start's side is searched first and bounds how far the other may lie.
+    With quantize=False the search runs on unrounded channels. "exit" is in_range when the
+    start already qualified, solved, or unreachable.
+    """
+    evaluations = 0
+
+    def luminance_at(value):
+        nonlocal evaluations
+        evaluations += 1
+        return hsl_luminance(hue, saturation, value, quantize)
+
+    def result(value, luminance, exit):
+        return {
+            "lightness": value,
+            "luminance": luminance,
+            "ratio": contrast_from_luminance(luminance, anchor_luminance),
+            "reached": exit != "unreachable",
+            "exit": exit,
+            "evaluations": evaluations,
+        }
+
+    start_luminance = luminance_at(lightness)
+    if minimum_ratio <= contrast_from_luminance(start_luminance, anchor_luminance) <= maximum_ratio:
+        return result(lightness, start_luminance, "in_range")
+
+    windows = contrast_luminance_windows(anchor_luminance, minimum_ratio, maximum_ratio)
+    if start_luminance < anchor_luminance:
+        windows.reverse()
+
+    lower, upper = min(lightness_range[0], lightness), max(lightness_range[1], lightness)
+    best = None
+    for low_luminance, high_luminance in windows:
+        if best is not None:
+            # Crossing the anchor only pays off if the far window is strictly nearer.
+            distance = abs(best[0] - lightness)
+            lower, upper = max(lower, lightness - distance), min(upper, lightness + distance)
+        if start_luminance < low_luminance:
+            value = search_hsl_channel(lambda value: luminance_at(value) >= low_luminance, lightness, upper)
+        else:
+            value = search_hsl_channel(lambda value: luminance_at(value) <= high_luminance, lightness, lower)
+        if value is None or (best is not None and abs(value - lightness) >= distance):
+            continue
 
-def tune_surface_chroma(color_hex, anchor_hex, maximum_dchroma, minimum_ratio, maximum_ratio):
+        luminance = luminance_at(value)
+        if low_luminance <= luminance <= high_luminance:
+            best = (value, luminance)
+
+    if best is not None:
+        return result(*best, "solved")
+    return result(lightness, start_luminance, "unreachable")
+
+def solve_lightness_for_contrast(
+    color_hex,
+    anchor_hex,
+    minimum_ratio,
+    maximum_ratio=math.inf,
+    lightness_range=LIGHTNESS_SEARCH_RANGE,
+):
     hue, saturation, lightness = hex_to_hsl(color_hex)
-    for _ in range(200):
-        _, dchroma, _ = oklab_delta(color_hex, anchor_hex)
-        if dchroma <= maximum_dchroma or saturation <= 0:
-            break
-        saturation = max(0, saturation - 0.5)
-        color_hex = hsl_to_hex(hue, saturation, lightness)
-        color_hex = tune_surface_contrast(color_hex, anchor_hex, minimum_ratio, maximum_ratio)
-        hue, saturation, lightness = hex_to_hsl(color_hex)
-    return color_hex
+    solution = solve_lightness(
+        hue,
+        saturation,
+        lightness,
+        relative_luminance(anchor_hex),
+        minimum_ratio,
+        maximum_ratio,
+        lightness_range,
+    )
+    if solution["lightness"] == lightness:
+        solution["color"] = color_hex
+    else:
+        solution["color"] = hsl_to_hex(hue, saturation, solution["lightness"])
+    return solution
+
+def format_ratio_target(minimum_ratio, maximum_ratio=math.inf):
+    if maximum_ratio == math.inf:
+        return f"{minimum_ratio:.3f}"
+    return f"{minimum_ratio:.3f}..{maximum_ratio:.3f}"
+
+def require_contrast(solution, color_hex, anchor_hex, minimum_ratio, maximum_ratio=math.inf):
+    if not solution["reached"]:
+        raise ValueError(
+            f"{color_hex} cannot reach contrast {format_ratio_target(minimum_ratio, maximum_ratio)} "
+            f"against {anchor_hex} within lightness {LIGHTNESS_SEARCH_RANGE[0]}..{LIGHTNESS_SEARCH_RANGE[1]}"
+        )
+    return solution["color"]
+
+def lift_until_contrast(color_hex, background_hex, minimum_ratio, label=None):
+    solution = solve_lightness_for_contrast(
+        color_hex,
+        background_hex,
+        minimum_ratio,
+        lightness_range=(hex_to_hsl(color_hex)[2], LIGHTNESS_SEARCH_RANGE[1]),
+    )
+    record_solver("lift_until_contrast", label, solution)
+    return require_contrast(solution, color_hex, background_hex, minimum_ratio)
+
+def darken_until_contrast(color_hex, background_hex, minimum_ratio, label=None):
+    solution = solve_lightness_for_contrast(
+        color_hex,
+        background_hex,
+        minimum_ratio,
+        lightness_range=(LIGHTNESS_SEARCH_RANGE[0], hex_to_hsl(color_hex)[2]),
+    )
+    record_solver("darken_until_contrast", label, solution)
+    return require_contrast(solution, color_hex, background_hex, minimum_ratio)
+
+def tune_surface_contrast(color_hex, anchor_hex, minimum_ratio, maximum_ratio, label=None):
+    solution = solve_lightness_for_contrast(color_hex, anchor_hex, minimum_ratio, maximum_ratio)
+    record_solver("tune_surface_contrast", label, solution)
+    return require_contrast(solution, color_hex, anchor_hex, minimum_ratio, maximum_ratio)
+
+def solve_surface_chroma(hue, saturation, lightness, anchor_hex, dchroma_range, ratio_range):
+    """
+    Find the (saturation, lightness) point closest to the given HSL color whose OKLab chroma
+    delta and contrast against the anchor both fall inside their ranges.
+
+    OKLab chroma grows with saturation once lightness is re-solved for the contrast band, so
+    the outer search runs over saturation and each probe solves lightness on unrounded floats.
+    The point is quantized to hex once at the end and nudged only if rounding pushed it out of
+    range. "iterations" counts saturation probes, "evaluations" counts color evaluations and
+    "exit" is in_range (model saturation kept), solved, rounding (needed nudges), or unreachable.
+    """
+    anchor_luminance = relative_luminance(anchor_hex)
+    anchor_chroma = oklch_from_oklab(rgb_to_oklab(anchor_hex))[1]
+    minimum_dchroma, maximum_dchroma = dchroma_range
+    probes = {}
+    counters = {"iterations": 0, "evaluations": 0}
+
+    def probe(value):
+        if value not in probes:
+            solution = solve_lightness(
+                hue,
+                value,
+                lightness,
+                anchor_luminance,
+                *ratio_range,
+                quantize=False,
+            )
+            lab = oklab_from_linear(linear_from_hsl(hue, value, solution["lightness"]))
+            solution["chroma"] = oklch_from_oklab(lab)[1]
+            counters["iterations"] += 1
+            counters["evaluations"] += solution["evaluations"] + 1
+            probes[value] = solution
+        return probes[value]
+
+    def result(color, exit, value):
+        ratio = contrast_ratio(color, anchor_hex)
+        _, dchroma, _ = oklab_delta(color, anchor_hex)
+        return {
+            "color": color,
+            "saturation": value,
+            "ratio": ratio,
+            "dchroma": dchroma,
+            "reached": exit != "unreachable",
+            "exit": exit,
+            **counters,
+        }
+
+    start = probe(saturation)
+    if not start["reached"]:
+        return result(hsl_to_hex(hue, saturation, lightness), "unreachable", saturation)
+
+    if start["chroma"] >= anchor_chroma:
+        low_chroma, high_chroma = anchor_chroma + minimum_dchroma, anchor_chroma + maximum_dchroma
+    else:
+        low_chroma, high_chroma = anchor_chroma - maximum_dchroma, anchor_chroma - minimum_dchroma
+
+    def in_window(value):
+        solution = probe(value)
+        return solution["reached"] and low_chroma <= solution["chroma"] <= high_chroma
+
+    value = saturation
+    if start["chroma"] > high_chroma:
+        value = search_hsl_channel(
+            lambda value: probe(value)["reached"] and probe(value)["chroma"] <= high_chroma,
+            saturation,
+            0,
+        )
+    elif start["chroma"] < low_chroma:
+        value = search_hsl_channel(
+            lambda value: probe(value)["reached"] and probe(value)["chroma"] >= low_chroma,
+            saturation,
+            100,
+        )
+    if value is None or not in_window(value):
+        return result(hsl_to_hex(hue, saturation, start["lightness"]), "unreachable", saturation)
+
+    # Quantize once; re-snap the contrast and step saturation inward if rounding escaped a range.
+    exit = "in_range" if value == saturation else "solved"
+    direction = 1 if probes[value]["chroma"] < (low_chroma + high_chroma) / 2 else -1
+    for _ in range(CHROMA_FIXUP_LIMIT):
+        color = hsl_to_hex(hue, value, probe(value)["lightness"])
+        if not ratio_range[0] <= contrast_ratio(color, anchor_hex) <= ratio_range[1]:
+            snapped = solve_lightness_for_contrast(color, anchor_hex, *ratio_range)
+            counters["evaluations"] += snapped["evaluations"]
+            color = snapped["color"]
+            exit = "rounding"
+        candidate = result(color, exit, value)
+        if (
+            ratio_range[0] <= candidate["ratio"] <= ratio_range[1]
+            and minimum_dchroma <= candidate["dchroma"] <= maximum_dchroma
+        ):
+            return candidate
+        value = clamp(value + direction * HSL_SEARCH_STEP, 0, 100)
+        exit = "rounding"
+    return result(candidate["color"], "unreachable", value)
+
+def tune_surface_chroma(hue, saturation, lightness, anchor_hex, dchroma_range, ratio_range, label=None):
+    solution = solve_surface_chroma(hue, saturation, lightness, anchor_hex, dchroma_range, ratio_range)
+    record_solver("tune_surface_chroma", label, solution)
+    if not solution["reached"]:
+        raise ValueError(
+            f"surface hsl({hue:.1f}, {saturation:.1f}%, {lightness:.1f}%) cannot reach OKLab dC "
+            f"{dchroma_range[0]:.3f}..{dchroma_range[1]:.3f} and contrast "
+            f"{format_ratio_target(*ratio_range)} against {anchor_hex}"
+        )
+    return solution["color"]
 
-def build_role_palette(spec):
-    surfaces = build_surface_roles(spec["surface_seed"])
+def build_neutral_palette(surface_seed):
+    return neutral_palette(build_surface_roles(surface_seed))
+
+def neutral_palette(surfaces):
     bg_editor = surfaces["BG_EDITOR"]
     fg_muted = lift_until_contrast(
         derive_neutral_role(bg_editor, "FG_MUTED"),
         bg_editor,
         TEXT_VALIDATION["foreground"]["ratio"],
+        label="FG_MUTED",
     )
     fg_main = lift_until_contrast(
         derive_neutral_role(bg_editor, "FG_MAIN"),
         bg_editor,
         TEXT_VALIDATION["editor.foreground"]["ratio"],
+        label="FG_MAIN",
     )
     fg_bright = lift_until_contrast(
         derive_neutral_role(bg_editor, "FG_BRIGHT"),
         bg_editor,
         TEXT_VALIDATION["descriptionForeground"]["ratio"],
+        label="FG_BRIGHT",
     )
 
     return {
@@ -380,93 +1024,167 @@ def build_role_palette(spec):
         "FG_MUTED": fg_muted,
         "FG_MAIN": fg_main,
         "FG_BRIGHT": fg_bright,
+        "SHADOW": derive_neutral_role(bg_editor, "SHADOW"),
+        "ANSI_DIM": derive_neutral_role(bg_editor, "ANSI_DIM"),
+    }
+
+def accent_roles(spec):
+    return {
         "ACCENT_PRI": spec["accent_primary"],
         "ACCENT_SEC": spec["accent_warning"],
         "ACCENT_TER": spec["accent_info"],
         "ACCENT_QUA": spec["accent_added"],
         "ACCENT_OP": spec.get("accent_warm", spec["accent_primary"]),
         "ERROR": spec["accent_error"],
-        "SHADOW": derive_neutral_role(bg_editor, "SHADOW"),
-        "ANSI_DIM": derive_neutral_role(bg_editor, "ANSI_DIM"),
     }
 
-def build_color_map(spec):
-    palette = build_role_palette(spec)
-    return {SOURCE_COLORS[key]: value for key, value in palette.items()}
+def build_role_palette(spec):
+    return {**build_neutral_palette(spec["surface_seed"]), **accent_roles(spec)}
+
+def mode_palette(palette, mode):
+    """
+    Re-solve a dark role palette for another mode. The hues and saturations of the dark
+    derivation are kept and only lightness is solved again, against the mode's thresholds:
+    light mode mirrors text lightness and darkens text and accents onto light surfaces,
+    high-contrast mode lifts them further above near-black surfaces.
+    """
+    if mode == "dark":
+        return palette
+    model = MODE_SURFACE_MODELS[mode]
+    surface_rules = MODES[mode]["surface_validation"]
+    text_rules = MODES[mode]["text_validation"]
+    light = mode == "light"
+
+    def rescaled(role, lightness=None):
+        hue, saturation, current = hex_to_hsl(palette[role])
+        return hue, clamp(saturation * model["saturation_scale"], 0, 100), current if lightness is None else lightness
+
+    bg_editor = hsl_to_hex(*rescaled("BG_EDITOR", model["editor_lightness"]))
+    bg_deep = tune_surface_contrast(
+        hsl_to_hex(*rescaled("BG_DEEP", model["deep_lightness"])),
+        bg_editor,
+        *surface_rules["sidebar_editor_ratio"],
+        label="BG_DEEP",
+    )
+    bg_mid = tune_surface_chroma(
+        *rescaled("BG_MID", model["mid_lightness"]),
+        bg_editor,
+        surface_rules["editor_mid_dchroma"],
+        surface_rules["editor_mid_ratio"],
+        label="BG_MID",
+    )
+    adjust = darken_until_contrast if light else lift_until_contrast
+
+    def mirrored(role):
+        hue, saturation, lightness = hex_to_hsl(palette[role])
+        return hsl_to_hex(hue, saturation, 100 - lightness) if light else palette[role]
+
+    roles = {
+        **palette,
+        "BG_DEEP": bg_deep,
+        "BG_EDITOR": bg_editor,
+        "BG_MID": bg_mid,
+        "ANSI_DIM": mirrored("ANSI_DIM"),
+    }
+    for role, key in (("FG_MUTED", "foreground"), ("FG_MAIN", "editor.foreground"), ("FG_BRIGHT", "descriptionForeground")):
+        roles[role] = adjust(mirrored(role), bg_editor, text_rules[key]["ratio"], label=role)
+    for role, key in ACCENT_CONTRAST_KEYS.items():
+        roles[role] = adjust(palette[role], bg_editor, text_rules[key]["ratio"], label=role)
+    return roles
 
 def validate_range(errors, label, value, lower, upper):
     if value < lower or value > upper:
         errors.append(f"{label}={value:.3f} outside {lower:.3f}..{upper:.3f}")
 
-def validate_theme(name, theme_data):
-    colors = theme_data["colors"]
-    errors = []
+VALIDATION_KEYS = ("sideBar.background", "editor.background", "editor.selectionBackground", *TEXT_VALIDATION)
+VALIDATION_PAIR_KEYS = (
+    ("sideBar.background", "editor.background"),
+    ("editor.background", "editor.selectionBackground"),
+    *((key, "editor.background") for key in TEXT_VALIDATION),
+)
+VALIDATION_PAIR_COUNT = len(VALIDATION_PAIR_KEYS)
+# Color key -> indexes of the validation pairs that read it.
+VALIDATION_DEPENDENCIES = {
+    key: tuple(index for index, pair in enumerate(VALIDATION_PAIR_KEYS) if key in pair)
+    for key in VALIDATION_KEYS
+}
 
-    sidebar_background = colors["sideBar.background"]
-    editor_background = colors["editor.background"]
-    editor_selection = colors["editor.selectionBackground"]
+def validation_pairs(colors, indexes=None):
+    """The foreground and background lists validate_theme compares, in check order (or just `indexes`)."""
+    pairs = VALIDATION_PAIR_KEYS if indexes is None else [VALIDATION_PAIR_KEYS[index] for index in indexes]
+    return [colors[foreground] for foreground, _ in pairs], [colors[background] for _, background in pairs]
 
-    surface_ratio = contrast_ratio(sidebar_background, editor_background)
-    surface_dlight, surface_dchroma, _ = oklab_delta(sidebar_background, editor_background)
-    surface_hue = hue_distance(hex_to_hsl(sidebar_background)[0], hex_to_hsl(editor_background)[0])
+def validation_errors(ratios, deltas, hues, mode="dark"):
+    """
+    Apply a mode's surface and text validation to one theme's compared validation pairs.
+
+    Returns (errors, metrics); "margin" in the metrics is the smallest relative headroom of
+    any text contrast above its minimum.
+    """
+    errors = []
+    surface_validation = MODES[mode]["surface_validation"]
+    text_validation = MODES[mode]["text_validation"]
+    text_keys = list(text_validation)
+
+    surface_ratio = ratios[0]
+    surface_dlight, surface_dchroma, _ = deltas[0]
+    surface_hue = hues[0]
 
     validate_range(
         errors,
         "sidebar/editor contrast",
         surface_ratio,
-        *SURFACE_VALIDATION["sidebar_editor_ratio"],
+        *surface_validation["sidebar_editor_ratio"],
     )
     validate_range(
         errors,
         "sidebar/editor OKLab dL",
         surface_dlight,
-        *SURFACE_VALIDATION["sidebar_editor_dlight"],
+        *surface_validation["sidebar_editor_dlight"],
     )
-    if surface_dchroma > SURFACE_VALIDATION["sidebar_editor_dchroma_max"]:
+    if surface_dchroma > surface_validation["sidebar_editor_dchroma_max"]:
         errors.append(
-            f"sidebar/editor OKLab dC={surface_dchroma:.3f} above {SURFACE_VALIDATION['sidebar_editor_dchroma_max']:.3f}"
+            f"sidebar/editor OKLab dC={surface_dchroma:.3f} above {surface_validation['sidebar_editor_dchroma_max']:.3f}"
         )
-    if surface_hue > SURFACE_VALIDATION["sidebar_editor_dhue_max"]:
+    if surface_hue > surface_validation["sidebar_editor_dhue_max"]:
         errors.append(
-            f"sidebar/editor hue delta={surface_hue:.1f} above {SURFACE_VALIDATION['sidebar_editor_dhue_max']:.1f}"
+            f"sidebar/editor hue delta={surface_hue:.1f} above {surface_validation['sidebar_editor_dhue_max']:.1f}"
         )
 
-    selection_ratio = contrast_ratio(editor_background, editor_selection)
-    selection_dlight, selection_dchroma, _ = oklab_delta(editor_background, editor_selection)
-    selection_hue = hue_distance(hex_to_hsl(editor_background)[0], hex_to_hsl(editor_selection)[0])
+    selection_ratio = ratios[1]
+    selection_dlight, selection_dchroma, _ = deltas[1]
+    selection_hue = hues[1]
 
     validate_range(
         errors,
         "editor/selection contrast",
         selection_ratio,
-        *SURFACE_VALIDATION["editor_mid_ratio"],
+        *surface_validation["editor_mid_ratio"],
     )
     validate_range(
         errors,
         "editor/selection OKLab dL",
         selection_dlight,
-        *SURFACE_VALIDATION["editor_mid_dlight"],
+        *surface_validation["editor_mid_dlight"],
     )
     validate_range(
         errors,
         "editor/selection OKLab dC",
         selection_dchroma,
-        *SURFACE_VALIDATION["editor_mid_dchroma"],
+        *surface_validation["editor_mid_dchroma"],
     )
-    if selection_hue > SURFACE_VALIDATION["editor_mid_dhue_max"]:
+    if selection_hue > surface_validation["editor_mid_dhue_max"]:
         errors.append(
-            f"editor/selection hue delta={selection_hue:.1f} above {SURFACE_VALIDATION['editor_mid_dhue_max']:.1f}"
+            f"editor/selection hue delta={selection_hue:.1f} above {surface_validation['editor_mid_dhue_max']:.1f}"
         )
-    if selection_ratio <= surface_ratio + SURFACE_VALIDATION["selection_margin"]:
+    if selection_ratio <= surface_ratio + surface_validation["selection_margin"]:
         errors.append(
             "editor selection layer is not sufficiently stronger than the sidebar/editor separation"
         )
 
-    for color_key, thresholds in TEXT_VALIDATION.items():
-        foreground = colors[color_key]
-        ratio = contrast_ratio(foreground, editor_background)
-        dlight, dchroma, _ = oklab_delta(foreground, editor_background)
-        hue = hue_distance(hex_to_hsl(foreground)[0], hex_to_hsl(editor_background)[0])
+    text_ratios = dict(zip(text_keys, ratios[2:]))
+    for color_key, ratio, (dlight, dchroma, _), hue in zip(text_keys, ratios[2:], deltas[2:], hues[2:]):
+        thresholds = text_validation[color_key]
 
         if ratio < thresholds["ratio"]:
             errors.append(f"{color_key} contrast={ratio:.3f} below {thresholds['ratio']:.3f}")
@@ -479,70 +1197,2730 @@ def validate_theme(name, theme_data):
                 f"{color_key} is not perceptually distinct enough from editor.background"
             )
 
+    return errors, {
+        "surface_ratio": surface_ratio,
+        "selection_ratio": selection_ratio,
+        "editor_fg_ratio": text_ratios["editor.foreground"],
+        "info_ratio": text_ratios["editorInfo.foreground"],
+        "margin": min(text_ratios[key] / text_validation[key]["ratio"] for key in text_keys) - 1,
+    }
+
+def validate_theme(name, theme_data, mode="dark"):
+    return check_validation(name, compare_colors(*validation_pairs(theme_data["colors"])), mode)
+
+def check_validation(name, comparison, mode="dark"):
+    errors, metrics = validation_errors(
+        comparison["contrast"],
+        comparison["oklab_delta"],
+        comparison["hue_distance"],
+        mode,
+    )
     if errors:
         joined = "\n  - ".join(errors)
         raise ValueError(f"{name} failed validation:\n  - {joined}")
+    return metrics
+
+# ─────────────────────────────────────────────────────────────
+#  CONTRAST AUDIT
+# ─────────────────────────────────────────────────────────────
+# Surfaces syntax colors are drawn on; those missing from a theme are skipped.
+AUDIT_TOKEN_SURFACES = (
+    "editor.background",
+    "editor.selectionBackground",
+    "editor.lineHighlightBackground",
+    "editorHoverWidget.background",
+    "peekViewEditor.background",
+)
+# (key pattern, minimum contrast), first match wins. Deliberately faint UI text only has to
+# stay visible; everything else is held to WCAG's 3:1 for large text and UI components.
+AUDIT_MINIMUMS = (
+    (re.compile(r"placeholder|inactive|disabled|ignored|deemphasized|linenumber|whitespace|ruler|inlayhint|ansi(bright)?black", re.I), 1.5),
+    (re.compile(r""), 3.0),
+)
+AUDIT_MODES = ("collect", "fail-fast")
+
+def composite_over(color, base):
+    """Blend a possibly translucent #rrggbbaa color over an opaque base, in sRGB like VS Code."""
+    top = Color.from_hex(color)
+    if top.alpha is None or top.alpha == 255:
+        return f"#{top.packed:06x}"
+    alpha = top.alpha / 255
+    return rgb_to_hex(*(
+        front * alpha + back * (1 - alpha)
+        for front, back in zip(top.rgb, hex_to_rgb(base))
+    ))
+
+@lru_cache(maxsize=None)
+def audit_minimum(key):
+    for pattern, minimum in AUDIT_MINIMUMS:
+        if pattern.search(key):
+            return minimum
+
+@lru_cache(maxsize=None)
+def component_background_keys(key):
+    component, _, _ = key.partition(".")
+    words = re.findall(r"[a-z]+|[A-Z][a-z]*", component)
+    return tuple("".join(words[:count]) + ".background" for count in range(len(words), 0, -1))
+
+def component_backgrounds(key, colors):
+    """Background keys of the UI part a key belongs to, most specific first (sideBarTitle -> sideBar)."""
+    return [candidate for candidate in component_background_keys(key) if candidate in colors and candidate != key]
+
+def opaque_background(key, colors):
+    """A background key's color as actually shown: composited over its part's (or the editor's) surface."""
+    value = colors[key]
+    if key == "editor.background":
+        return composite_over(value, "#000000")
+    bases = component_backgrounds(key, colors) + ["editor.background"]
+    return composite_over(value, opaque_background(bases[0], colors))
+
+def foreground_backgrounds(key, colors):
+    """The background keys a `colors` foreground key is drawn on."""
+    if key == "foreground":
+        return [surface for surface in ("editor.background", "sideBar.background") if surface in colors]
+    stem = key[: -len("foreground")]
+    own = stem + ("background" if stem.endswith(".") or not stem else "Background")
+    candidates = ([own] if own in colors else []) + component_backgrounds(key, colors)
+    return candidates[:1] or ["editor.background"]
+
+def audit_pairs(theme_data):
+    """
+    Every (label, foreground, background key, minimum) the audit checks: `colors` foregrounds
+    on their part's background, and tokenColors/semanticTokenColors foregrounds on each
+    AUDIT_TOKEN_SURFACES entry.
+    """
+    colors = theme_data.get("colors", {})
+    surfaces = [surface for surface in AUDIT_TOKEN_SURFACES if surface in colors]
+    pairs = []
+    for key, value in colors.items():
+        if key.lower().endswith("foreground") and isinstance(value, str):
+            for background in foreground_backgrounds(key, colors):
+                pairs.append((key, value, background, audit_minimum(key)))
+
+    for index, rule in enumerate(theme_data.get("tokenColors", [])):
+        foreground = rule.get("settings", {}).get("foreground")
+        if foreground:
+            scope = rule.get("scope", rule.get("name", ""))
+            label = f"tokenColors[{index}] {scope if isinstance(scope, str) else ', '.join(scope)}"
+            minimum = audit_minimum(label)
+            pairs += [(label, foreground, surface, minimum) for surface in surfaces]
+
+    for selector, style in theme_data.get("semanticTokenColors", {}).items():
+        foreground = style if isinstance(style, str) else style.get("foreground")
+        if foreground:
+            label = f"semanticTokenColors {selector}"
+            minimum = audit_minimum(label)
+            pairs += [(label, foreground, surface, minimum) for surface in surfaces]
+    return pairs
+
+def audit_theme(theme_data, fail_fast=False):
+    """
+    Composite every audited foreground over its opaque background and compare all distinct
+    composited pairs in one batch_contrast_ratio pass. Returns the violations (contrast below the
+    pair's minimum); with fail_fast, stops at the first one.
+    """
+    colors = theme_data.get("colors", {})
+    pairs = audit_pairs(theme_data)
+    backgrounds = {}
+    composited = {}
+    pair_keys = []
+    for _, value, background, _ in pairs:
+        if background not in backgrounds:
+            backgrounds[background] = opaque_background(background, colors)
+        key = (value, backgrounds[background])
+        if key not in composited:
+            composited[key] = (composite_over(value, key[1]), key[1])
+        pair_keys.append(key)
+    distinct = list(composited.values())
+    numbers = {key: number for number, key in enumerate(composited)}
+    contrasts = batch_contrast_ratio([front for front, _ in distinct], [back for _, back in distinct])
+
+    violations = []
+    for (label, value, background, minimum), key in zip(pairs, pair_keys):
+        number = numbers[key]
+        contrast = contrasts[number]
+        if contrast >= minimum:
+            continue
+        violations.append({
+            "key": label,
+            "color": value,
+            "background": background,
+            "composited": list(distinct[number]),
+            "contrast": round(contrast, 3),
+            "minimum": minimum,
+            "oklab_delta": [round(delta, 4) for delta in oklab_delta(*distinct[number])],
+        })
+        if fail_fast:
+            break
+    return violations
+
+def format_violation(violation):
+    return (
+        f"{violation['key']} on {violation['background']}: "
+        f"contrast={violation['contrast']:.3f} below {violation['minimum']:.2f}"
+    )
+
+def print_audit_report(results, mode, report_path):
+    audited = [result for result in results if result.get("audit") is not None]
+    total = sum(len(result["audit"]) for result in audited)
+    print(f"\n🔎 Contrast audit ({mode}): {total} violation(s) in {len(audited)} variant(s)")
+    for result in audited:
+        worst = sorted(result["audit"], key=lambda violation: violation["contrast"] / violation["minimum"])
+        print(f"   {result['name']:<12} {len(worst)} below minimum")
+        for violation in worst[:3]:
+            print(f"     {format_violation(violation)}")
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump({result["name"]: result["audit"] for result in audited}, f, indent=2)
+        f.write("\n")
+    print(f"   Wrote {report_path}")
+    return total
+
+# ─────────────────────────────────────────────────────────────
+#  DISTINGUISHABILITY
+# ─────────────────────────────────────────────────────────────
+DISTINCT_DELTA = 0.02   # OKLab distance; roughly one just-noticeable difference
+GRID_NEIGHBORS = [
+    offset for offset in itertools.product((-1, 0, 1), repeat=3) if offset > (0, 0, 0)
+]
+
+def theme_foregrounds(theme_data):
+    """
+    Map each distinct syntax foreground, composited over the editor background, to the
+    tokenColors rules and semanticTokenColors selectors that use it. Roles sharing one exact
+    color are treated as one foreground on purpose.
+    """
+    colors = theme_data.get("colors", {})
+    background = composite_over(colors.get("editor.background", "#000000"), "#000000")
+    sources = {}
+
+    def add(color, source):
+        sources.setdefault(composite_over(color, background), []).append(source)
+
+    if colors.get("editor.foreground"):
+        add(colors["editor.foreground"], "editor.foreground")
+    for number, rule in enumerate(theme_data.get("tokenColors", [])):
+        color = rule.get("settings", {}).get("foreground")
+        if color:
+            add(color, rule.get("name") or f"tokenColors[{number}]")
+    for selector, value in theme_data.get("semanticTokenColors", {}).items():
+        color = value if isinstance(value, str) else value.get("foreground")
+        if color:
+            add(color, f"semantic {selector}")
+    return sources
+
+def close_pairs(points, delta):
+    """
+    Yield (i, j, distance) for every pair of 3D points closer than delta. Points are bucketed
+    into a grid of delta-sized cells, so only the same and adjacent cells are compared; each
+    cell pair is visited once by walking half of the 26 neighbors.
+    """
+    grid = {}
+    for number, point in enumerate(points):
+        grid.setdefault(tuple(math.floor(value / delta) for value in point), []).append(number)
+    for (x, y, z), members in grid.items():
+        for position, first in enumerate(members):
+            for second in members[position + 1:]:
+                distance = math.dist(points[first], points[second])
+                if distance < delta:
+                    yield first, second, distance
+        for dx, dy, dz in GRID_NEIGHBORS:
+            for second in grid.get((x + dx, y + dy, z + dz), ()):
+                for first in members:
+                    distance = math.dist(points[first], points[second])
+                    if distance < delta:
+                        yield first, second, distance
+
+def color_collisions(theme_data, delta=DISTINCT_DELTA):
+    """Return the pairs of distinct syntax foregrounds closer than delta in OKLab, closest first."""
+    sources = theme_foregrounds(theme_data)
+    colors = list(sources)
+    points = [rgb_to_oklab(color) for color in colors]
+    collisions = [
+        {
+            "colors": [colors[first], colors[second]],
+            "delta": round(distance, 4),
+            "sources": [sources[colors[first]], sources[colors[second]]],
+        }
+        for first, second, distance in close_pairs(points, delta)
+    ]
+    return sorted(collisions, key=lambda collision: collision["delta"])
+
+def format_collision(collision):
+    (color_a, color_b), (sources_a, sources_b) = collision["colors"], collision["sources"]
+    return (
+        f"{color_a} ({', '.join(sources_a[:2])}) ≈ {color_b} ({', '.join(sources_b[:2])}) "
+        f"ΔE={collision['delta']:.4f}"
+    )
+
+def print_collision_report(collisions, delta, report_path):
+    """Print {variant: collisions} and write them to report_path. Returns the total count."""
+    total = sum(len(found) for found in collisions.values())
+    print(f"\n🎯 Distinguishability (OKLab ΔE < {delta}): {total} collision(s) in {len(collisions)} variant(s)")
+    for name, found in collisions.items():
+        if found:
+            print(f"   {name:<12} {len(found)} close pair(s)")
+            for collision in found[:3]:
+                print(f"     {format_collision(collision)}")
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(collisions, f, indent=2)
+        f.write("\n")
+    print(f"   Wrote {report_path}")
+    return total
+
+# ─────────────────────────────────────────────────────────────
+#  COLOR VISION SIMULATION
+# ─────────────────────────────────────────────────────────────
+CVD_MODES = ("off", "warn", "strict")
 
+def cvd_colors(theme_data, mode="dark"):
+    """The few colors the CVD pass reads from one rendered theme, small enough to return from a worker."""
+    colors = theme_data["colors"]
     return {
-        "surface_ratio": surface_ratio,
-        "selection_ratio": selection_ratio,
-        "editor_fg_ratio": contrast_ratio(colors["editor.foreground"], editor_background),
-        "info_ratio": contrast_ratio(colors["editorInfo.foreground"], editor_background),
+        "mode": mode,
+        "text": {key: colors[key] for key in MODES[mode]["text_validation"]},
+        "background": colors["editor.background"],
+        "foregrounds": theme_foregrounds(theme_data),
     }
 
-def apply_color_map(source_json_str, color_map):
-    result = source_json_str
-    for src, tgt in sorted(color_map.items(), key=lambda x: len(x[0]), reverse=True):
-        pattern = re.compile(re.escape(src.lower()) + r'([0-9a-fA-F]{0,2})(?=["\s,}])', re.IGNORECASE)
-        result = pattern.sub(lambda m: tgt.lower() + m.group(1).lower(), result)
-    return result
-
-def clean_json(content):
-    content = re.sub(r'//.*?$', '', content, flags=re.MULTILINE)
-    content = re.sub(r',\s*([}\]])', r'\1', content)
-    return content
-
-def generate_theme(source_str, name, spec, light_accent=None):
-    color_map = build_color_map(spec)
-    themed_str = apply_color_map(source_str, color_map)
-    clean = clean_json(themed_str)
-    
-    try:
-        theme_data = json.loads(clean)
-    except json.JSONDecodeError:
-        # Try harder cleanup
-        clean = re.sub(r',\s*,', ',', clean)
-        theme_data = json.loads(clean)
+def cvd_reports(themes, delta=DISTINCT_DELTA):
+    """
+    Re-run the text contrast minimums and the distinguishability check under protan, deutan
+    and tritan simulation for {name: cvd_colors(...)}. Every color of every theme goes through
+    one simulate_cvd call. Returns {name: {deficiency: {"contrast": [...], "collisions": [...]}}},
+    listing only deficiencies with findings.
+    """
+    colors = []
+    offsets = {}
+    for name, inputs in themes.items():
+        offsets[name] = len(colors)
+        colors += [*inputs["text"].values(), inputs["background"], *inputs["foregrounds"]]
+    simulated = simulate_cvd(colors)
+
+    reports = {}
+    for name, inputs in themes.items():
+        text_validation = MODES[inputs["mode"]]["text_validation"]
+        start = offsets[name]
+        background = start + len(inputs["text"])
+        foregrounds = list(inputs["foregrounds"])
+        report = {}
+        for deficiency, values in simulated.items():
+            luminance = values["luminance"]
+            contrast = [
+                f"{key} contrast={ratio:.3f} below {text_validation[key]['ratio']:.3f}"
+                for number, key in enumerate(inputs["text"])
+                for ratio in [contrast_from_luminance(luminance[start + number], luminance[background])]
+                if ratio < text_validation[key]["ratio"]
+            ]
+            labs = values["oklab"][background + 1:background + 1 + len(foregrounds)]
+            collisions = sorted(
+                (
+                    {
+                        "colors": [foregrounds[first], foregrounds[second]],
+                        "delta": round(distance, 4),
+                        "sources": [inputs["foregrounds"][foregrounds[first]], inputs["foregrounds"][foregrounds[second]]],
+                    }
+                    for first, second, distance in close_pairs(labs, delta)
+                ),
+                key=lambda collision: collision["delta"],
+            )
+            if contrast or collisions:
+                report[deficiency] = {"contrast": contrast, "collisions": collisions}
+        reports[name] = report
+    return reports
+
+def print_cvd_report(reports, delta, report_path):
+    """Print a compact summary of cvd_reports() and write it to report_path. Returns the finding count."""
+    total = 0
+    affected = {deficiency: 0 for deficiency in CVD_MATRICES}
+    for report in reports.values():
+        for deficiency, findings in report.items():
+            affected[deficiency] += 1
+            total += len(findings["contrast"]) + len(findings["collisions"])
+    summary = ", ".join(f"{deficiency} {count}" for deficiency, count in affected.items())
+    print(f"\n👁️  Color vision simulation (ΔE < {delta}): {total} finding(s); variants affected: {summary}")
+    for name, report in reports.items():
+        for deficiency, findings in report.items():
+            first = findings["contrast"][0] if findings["contrast"] else format_collision(findings["collisions"][0])
+            count = len(findings["contrast"]) + len(findings["collisions"])
+            print(f"   {name:<12} {deficiency}: {count} ({first})")
+    # Written only when it changed, so a warm build with nothing to do touches no files.
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    if write_if_changed(report_path, json.dumps(reports, indent=2, sort_keys=True) + "\n"):
+        print(f"   Wrote {report_path}")
+    return total
+
+SLOT_PATTERN = re.compile(r"#([0-9a-fA-F]{6})([0-9a-fA-F]{0,2})")
+
+JSONC_TOKEN = re.compile(
+    r'"[^"\\]*(?:\\.[^"\\]*)*"'        # string
+    r'|[{}\[\],:]'                       # punctuation
+    r'|//[^\n]*'                        # line comment
+    r'|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/'   # block comment
+    r'|[^\s{}\[\],:"/]+'                # number or literal
+    r'|\S'                              # anything else is an error
+)
+JSONC_LITERALS = {"true": True, "false": False, "null": None}
+JSONC_STRING = re.compile(r'"[^"\\\n]*(?:\\.[^"\\\n]*)*"')
+JSONC_COMMENT = re.compile(r'//[^\n]*|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/')
+JSONC_TRAILING_COMMA = re.compile(r',(?<=[\w"\]}],)(?=\s*[}\]])')
+
+def is_jsonc_comment(token):
+    return token[0] == "/" and token[1:2] in ("/", "*")
+
+def strip_outside_strings(text, pattern):
+    """
+    Remove every match of pattern that does not start inside a string literal.
+
+    Matches are found by the C regex engine; JSON strings cannot span lines, so only the
+    literals on a match's own line are scanned to rule it in or out.
+    """
+    parts = []
+    kept = scan = 0
+    match = pattern.search(text)
+    while match:
+        start = match.start()
+        scan = max(scan, text.rfind("\n", 0, start) + 1)
+        while scan < start:
+            quote = text.find('"', scan, start)
+            if quote < 0:
+                scan = start
+                break
+            literal = JSONC_STRING.match(text, quote)
+            scan = literal.end() if literal else quote + 1
+        if scan > start:
+            match = pattern.search(text, scan)
+            continue
+        parts.append(text[kept:start])
+        kept = scan = match.end()
+        match = pattern.search(text, kept)
+    if not parts:
+        return text
+    parts.append(text[kept:])
+    return "".join(parts)
+
+def strip_jsonc(text):
+    return strip_outside_strings(strip_outside_strings(text, JSONC_COMMENT), JSONC_TRAILING_COMMA)
+
+def parse_jsonc(text, keep_comments=False):
+    """
+    Parse JSON with comments and trailing commas.
+
+    String contents are never inspected for comment markers, so values such as URLs survive.
+    By default strip_jsonc() removes comments and trailing commas and the json decoder builds
+    the data. With keep_comments=True, or when that decode fails, the text is tokenized and
+    parsed here instead so positions and errors can be reported.
+
+    With keep_comments=True the result is (data, comments). Each comment records its offset,
+    text and the JSON path of the member or element it precedes; the path ends in None when
+    the comment sits before a closing bracket, and is () before the document itself.
+    dump_jsonc() writes them back out.
+    """
+    if not keep_comments:
+        try:
+            return json.loads(strip_jsonc(text))
+        except json.JSONDecodeError:
+            pass
+
+    tokens = JSONC_TOKEN.finditer(text)
+    comments = []
+    path = []
+
+    def fail(message, match):
+        offset = match.start() if match else len(text)
+        line = text.count("\n", 0, offset) + 1
+        raise ValueError(f"{message} at line {line} (offset {offset})")
+
+    def next_token():
+        for match in tokens:
+            token = match.group()
+            if is_jsonc_comment(token):
+                if keep_comments:
+                    comments.append({"offset": match.start(), "text": token, "path": None})
+                continue
+            return token, match
+        return None, None
+
+    def claim_comments(key):
+        # Comments gathered since the last member belong to the member that follows them.
+        for comment in reversed(comments):
+            if comment["path"] is not None:
+                break
+            comment["path"] = tuple(path) + (key,)
+
+    def scalar(token, match):
+        if token in JSONC_LITERALS:
+            return JSONC_LITERALS[token]
+        try:
+            if token[0] == '"':
+                return json.decoder.scanstring(token, 1)[0]
+            return json.loads(token)
+        except ValueError:
+            fail(f"unexpected token {token!r}", match)
+
+    def value(token, match):
+        if token == "{":
+            result = {}
+            while True:
+                token, match = next_token()
+                if token == "}":
+                    claim_comments(None)
+                    return result
+                if token is None or token[0] != '"':
+                    fail("expected object key", match)
+                key = scalar(token, match)
+                claim_comments(key)
+                token, match = next_token()
+                if token != ":":
+                    fail("expected ':'", match)
+                path.append(key)
+                result[key] = value(*next_token())
+                path.pop()
+                token, match = next_token()
+                if token == "}":
+                    claim_comments(None)
+                    return result
+                if token != ",":
+                    fail("expected ',' or '}'", match)
+        if token == "[":
+            result = []
+            while True:
+                token, match = next_token()
+                if token == "]":
+                    claim_comments(None)
+                    return result
+                claim_comments(len(result))
+                path.append(len(result))
+                result.append(value(token, match))
+                path.pop()
+                token, match = next_token()
+                if token == "]":
+                    claim_comments(None)
+                    return result
+                if token != ",":
+                    fail("expected ',' or ']'", match)
+        if token is None or token in "}],:":
+            fail("expected a value", match)
+        return scalar(token, match)
+
+    token, match = next_token()
+    if keep_comments:
+        for comment in comments:
+            comment["path"] = ()
+    data = value(token, match)
+    token, match = next_token()
+    if token is not None:
+        fail("unexpected trailing content", match)
+    if keep_comments:
+        claim_comments(None)
+        return data, comments
+    return data
+
+def dump_jsonc(data, comments=(), indent=2):
+    comments_by_path = {}
+    for comment in comments:
+        comments_by_path.setdefault(comment["path"], []).append(comment["text"])
+    lines = []
+
+    def emit_comments(path, depth):
+        for text in comments_by_path.get(path, ()):
+            lines.append(" " * (indent * depth) + text)
+
+    def emit(node, path, depth, prefix, suffix):
+        pad = " " * (indent * depth)
+        if isinstance(node, (dict, list)) and node:
+            opening, closing = ("{", "}") if isinstance(node, dict) else ("[", "]")
+            lines.append(pad + prefix + opening)
+            items = list(node.items()) if isinstance(node, dict) else list(enumerate(node))
+            for position, (key, child) in enumerate(items):
+                emit_comments(path + (key,), depth + 1)
+                child_prefix = json.dumps(key) + ": " if isinstance(node, dict) else ""
+                emit(child, path + (key,), depth + 1, child_prefix, "," if position < len(items) - 1 else "")
+            emit_comments(path + (None,), depth + 1)
+            lines.append(pad + closing + suffix)
+        else:
+            lines.append(pad + prefix + json.dumps(node) + suffix)
+
+    emit_comments((), 0)
+    emit(data, (), 0, "", "")
+    emit_comments((None,), 0)
+    return "\n".join(lines) + "\n"
+
+def parse_template(source_str):
+    return parse_jsonc(source_str)
+
+def compile_template(template_data):
+    """
+    Compile a parsed template into a render plan.
+
+    Every string value that is a source color (optionally with an alpha suffix) becomes a slot
+    recorded as (JSON path, source role, alpha suffix); everything else stays in the skeleton.
+    The plan also lists the distinct (role, alpha) fills and the spine (see compile_spine).
+    """
+    roles_by_color = {color[1:].lower(): role for role, color in SOURCE_COLORS.items()}
+    slots = []
+
+    def visit(node, path):
+        if isinstance(node, dict):
+            items = node.items()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            return
+        for key, value in items:
+            if isinstance(value, str):
+                match = SLOT_PATTERN.fullmatch(value)
+                if match and match.group(1).lower() in roles_by_color:
+                    slots.append((path + (key,), roles_by_color[match.group(1).lower()], match.group(2).lower()))
+            else:
+                visit(value, path + (key,))
+
+    visit(template_data, ())
+    fills = list(dict.fromkeys((role, alpha) for _, role, alpha in slots))
+    return {
+        "skeleton": template_data,
+        "slots": slots,
+        "index": index_slots(slots),
+        "fills": fills,
+        "spine": compile_spine(template_data, slots, fills),
+    }
+
+def compile_spine(skeleton, slots, fills):
+    """
+    The containers a render has to copy: those holding a slot, their ancestors, and the
+    "colors" object apply_theme_overrides writes to. Each spine node is (slot keys, fill
+    numbers, ((key, child spine node), ...)); every other subtree is shared with the skeleton.
+    """
+    fill_numbers = {fill: number for number, fill in enumerate(fills)}
+    root = {"keys": [], "numbers": [], "children": {}}
+
+    def node_at(path):
+        node = root
+        for key in path:
+            node = node["children"].setdefault(key, {"keys": [], "numbers": [], "children": {}})
+        return node
+
+    if isinstance(skeleton, dict) and isinstance(skeleton.get("colors"), dict):
+        node_at(("colors",))
+    for path, role, alpha in slots:
+        node = node_at(path[:-1])
+        node["keys"].append(path[-1])
+        node["numbers"].append(fill_numbers[role, alpha])
+
+    def freeze(node):
+        children = tuple((key, freeze(child)) for key, child in node["children"].items())
+        return tuple(node["keys"]), tuple(node["numbers"]), children
+
+    return freeze(root)
+
+def index_slots(slots):
+    """
+    Reverse index of a plan's slots: the slot numbers each source role fills (across colors,
+    tokenColors and semanticTokenColors) and the slot number at each JSON path.
+    """
+    roles = {}
+    for number, (path, role, _) in enumerate(slots):
+        roles.setdefault(role, []).append(number)
+    return {"roles": roles, "paths": {path: number for number, (path, _, _) in enumerate(slots)}}
+
+def fill_spine(node, spine, values):
+    keys, numbers, children = spine
+    filled = node.copy()
+    if isinstance(filled, dict):
+        filled.update(zip(keys, map(values.__getitem__, numbers)))
+    else:
+        for key, number in zip(keys, numbers):
+            filled[key] = values[number]
+    for key, child in children:
+        filled[key] = fill_spine(node[key], child, values)
+    return filled
+
+def fill_values(plan, palette):
+    return [palette[role].lower() + alpha for role, alpha in plan["fills"]]
+
+def render_template(plan, palette):
+    """
+    Copy the plan's spine and fill its slots. Slot-free subtrees are shared with the skeleton
+    and every other render, so anything that edits a rendered theme in place (apply_theme_overrides,
+    render_paths) must only write to spine containers or copy what it writes to.
+    """
+    return fill_spine(plan["skeleton"], plan["spine"], fill_values(plan, palette))
+
+def render_theme(plan, name, palette, light_accent=None, mode="dark"):
+    return apply_theme_overrides(render_template(plan, palette), name, light_accent, mode)
+
+LIGHT_ACCENT_ALPHAS = {
+    "editorBracketMatch.background": "20",
+    "editor.findMatchBorder": "",
+    "editorBracketMatch.border": "70",
+    "editor.selectionHighlightBackground": "15",
+}
 
+def apply_theme_overrides(theme_data, name, light_accent=None, mode="dark"):
     theme_data["name"] = name
-    theme_data["type"] = "dark"
+    theme_data["type"] = MODES[mode]["type"]
 
-    if light_accent:
+    # Light accents are pale highlights for dark surfaces; light themes keep the template's.
+    if light_accent and mode != "light":
         la = light_accent.lower()
         colors = theme_data.get("colors", {})
-        colors["editorBracketMatch.background"] = la + "20"
-        colors["editor.findMatchBorder"] = la
-        colors["editorBracketMatch.border"] = la + "70"
-        colors["editor.selectionHighlightBackground"] = la + "15"
+        for key, alpha in LIGHT_ACCENT_ALPHAS.items():
+            colors[key] = la + alpha
         theme_data["colors"] = colors
 
-    metrics = validate_theme(name, theme_data)
-    return json.dumps(theme_data, indent=2) + "\n", metrics
+    return theme_data
 
-def main():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    source_path = os.path.join(script_dir, "themes", "color-sea-template.json")
+# ─────────────────────────────────────────────────────────────
+#  INCREMENTAL RE-RENDERING
+# ─────────────────────────────────────────────────────────────
+def diff_paths(old, new, path=()):
+    """
+    Yield the JSON paths where two parsed templates differ. A container whose keys, key
+    order or length changed is reported as a whole.
+    """
+    if type(old) is not type(new):
+        yield path
+    elif isinstance(new, dict):
+        if list(old) != list(new):
+            yield path
+            return
+        for key, value in new.items():
+            yield from diff_paths(old[key], value, path + (key,))
+    elif isinstance(new, list):
+        if len(old) != len(new):
+            yield path
+            return
+        for index, value in enumerate(new):
+            yield from diff_paths(old[index], value, path + (index,))
+    elif old != new:
+        yield path
+
+def render_paths(plan, palette, theme_data, paths):
+    """
+    Patch `theme_data` in place so every path holds what render_template(plan, palette) would.
+    The watch loop patches cached variants this way. A patched theme may share subtrees with
+    skeletons of earlier plans, so every container on a path is copied before it is written.
+    """
+    values = fill_values(plan, palette)
+    slot_paths = plan["index"]["paths"]
+    copied = set()
+    for path in paths:
+        parent = theme_data
+        for key in path[:-1]:
+            child = parent[key]
+            if id(child) not in copied:
+                child = parent[key] = child.copy()
+                copied.add(id(child))
+            parent = child
+        node, spine = plan["skeleton"], plan["spine"]
+        try:
+            for key in path:
+                node = node[key]
+                spine = spine and dict(spine[2]).get(key)
+        except (KeyError, IndexError):
+            # Only light accent overrides add keys the template lacks.
+            parent.pop(path[-1], None)
+            continue
+
+        if path in slot_paths:
+            role, alpha = plan["slots"][slot_paths[path]][1:]
+            parent[path[-1]] = palette[role].lower() + alpha
+        elif spine:
+            parent[path[-1]] = fill_spine(node, spine, values)
+            copied.add(id(parent[path[-1]]))
+        else:
+            parent[path[-1]] = node
+
+def changed_role_paths(plan, old_palette, new_palette):
+    """JSON paths filled by the roles whose color differs between two palettes."""
+    roles = [role for role, value in new_palette.items() if old_palette.get(role) != value]
+    return [plan["slots"][number][0] for role in roles for number in plan["index"]["roles"].get(role, ())]
+
+def variant_state(plan, label, palette, light_accent=None, mode="dark"):
+    """A fully rendered variant plus the comparisons its validation reads, kept for patching."""
+    theme_data = render_theme(plan, label, palette, light_accent, mode)
+    return {
+        "label": label,
+        "mode": mode,
+        "palette": palette,
+        "light_accent": light_accent,
+        "theme": theme_data,
+        "comparison": compare_colors(*validation_pairs(theme_data["colors"])),
+        "compared": VALIDATION_PAIR_COUNT,
+    }
+
+def patch_variant_state(state, plan, paths, palette, light_accent=None):
+    """
+    Bring a variant_state up to date with a new plan, palette and light accent, given the
+    template paths that changed. Role changes are found through the plan's reverse index,
+    and only validation pairs that read a patched color key are compared again.
+    """
+    paths = list(paths) + changed_role_paths(plan, state["palette"], palette)
+    if light_accent != state["light_accent"]:
+        paths += [("colors", key) for key in LIGHT_ACCENT_ALPHAS]
+    if () in paths:
+        state.update(variant_state(plan, state["label"], palette, light_accent, state["mode"]))
+        return state
+
+    render_paths(plan, palette, state["theme"], paths)
+    apply_theme_overrides(state["theme"], state["label"], light_accent, state["mode"])
+    state["palette"] = palette
+    state["light_accent"] = light_accent
+
+    if any(path == ("colors",) for path in paths):
+        indexes = list(range(VALIDATION_PAIR_COUNT))
+    else:
+        keys = {path[1] for path in paths if len(path) > 1 and path[0] == "colors"}
+        indexes = sorted({index for key in keys for index in VALIDATION_DEPENDENCIES.get(key, ())})
+    if indexes:
+        comparison = compare_colors(*validation_pairs(state["theme"]["colors"], indexes))
+        for position, index in enumerate(indexes):
+            for metric, values in comparison.items():
+                state["comparison"][metric][index] = values[position]
+    state["compared"] = len(indexes)
+    return state
+
+def output_encoder(output_format="pretty", sort_keys=False):
+    return json.JSONEncoder(sort_keys=sort_keys, **OUTPUT_FORMATS[output_format])
+
+def stream_json(data, path, encoder):
+    """
+    Encode `data` straight into `path` chunk by chunk, without building the whole document
+    as one string. Returns (sha256, size) with the digest matching hash_parts(content).
+    With path=None nothing is written and only the digest and size are computed.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    f = open(path, "wb") if path else None
+    try:
+        pending, pending_length = [], 0
+        for chunk in itertools.chain(encoder.iterencode(data), ("\n", None)):
+            if chunk is not None:
+                pending.append(chunk)
+                pending_length += len(chunk)
+                if pending_length < STREAM_BUFFER_SIZE:
+                    continue
+            block = "".join(pending).encode("utf-8")
+            if f:
+                f.write(block)
+            digest.update(block)
+            size += len(block)
+            pending, pending_length = [], 0
+    finally:
+        if f:
+            f.close()
+    digest.update(b"\0")
+    return digest.hexdigest(), size
+
+def render_variant(plan, name, palette, light_accent=None, audit=None, mode="dark"):
+    """
+    Render and validate one mode of a variant from that mode's role palette (see mode_palette),
+    optionally auditing it (see AUDIT_MODES). Returns (theme_data, metrics, audit violations or None).
+    """
+    theme_data = profiled("render", render_theme, plan, name, palette, light_accent, mode)
+    metrics = profiled("validate", validate_theme, name, theme_data, mode)
+    violations = None
+    if audit:
+        violations = profiled("audit", audit_theme, theme_data, audit == "fail-fast")
+        if violations and audit == "fail-fast":
+            raise ValueError(f"{name} failed the contrast audit:\n  - {format_violation(violations[0])}")
+    return theme_data, metrics, violations
+
+# ─────────────────────────────────────────────────────────────
+#  CHECK MODE
+# ─────────────────────────────────────────────────────────────
+CHECK_DIFF_LIMIT = 3
+
+def format_json_path(path):
+    """Render a diff_paths() path as e.g. colors["editor.background"] or tokenColors[3].scope."""
+    text = ""
+    for key in path:
+        if isinstance(key, int):
+            text += f"[{key}]"
+        elif re.fullmatch(r"[A-Za-z_]\w*", key):
+            text += f".{key}"
+        else:
+            text += f"[{json.dumps(key)}]"
+    return text.lstrip(".") or "(root)"
+
+def check_content(expected, path, digest=None, size=None):
+    """
+    Compare parsed JSON `expected` with the file at `path` without writing anything.
+    When the rendered (digest, size) is known the file is compared by hash first, and only
+    a mismatch is parsed for a structural diff. Returns None when current, else a short
+    problem description.
+    """
+    try:
+        with open(path, "rb") as f:
+            current = f.read()
+    except OSError:
+        return "missing"
+    if digest is not None and len(current) == size and hash_parts(current) == digest:
+        return None
+    try:
+        existing = json.loads(current)
+    except ValueError:
+        return "not valid JSON"
+    paths = list(itertools.islice(diff_paths(existing, expected), CHECK_DIFF_LIMIT + 1))
+    if not paths:
+        return None if digest is None else "formatting differs"
+    shown = ", ".join(format_json_path(p) for p in paths[:CHECK_DIFF_LIMIT])
+    return f"differs at {shown}{', …' if len(paths) > CHECK_DIFF_LIMIT else ''}"
+
+WORKER_PLAN = None
+WORKER_PLANS = {}
+WORKER_OPTIONS = {}
+
+# Build options handed to every worker; see build_variants.
+VARIANT_OPTIONS = {
+    "profile": False,   # attach per-stage and solver profiles
+    "output": {},       # output_encoder() keyword arguments
+    "audit": None,      # contrast audit mode, or None
+    "check": False,     # render in memory and compare instead of writing
+    "cvd": False,       # attach the colors cvd_reports() needs
+    "surface_lut": None,  # surface table path for --explore (see build_surface_lut), or None
+}
+
+def init_variant_worker(plans, options=None):
+    """Install {template key: compiled plan} and the build options; WORKER_PLAN is the first plan."""
+    global WORKER_PLAN, WORKER_PLANS, WORKER_OPTIONS
+    WORKER_PLANS = plans
+    WORKER_PLAN = next(iter(plans.values()))
+    WORKER_OPTIONS = {**VARIANT_OPTIONS, **(options or {})}
+    WORKER_OPTIONS["encoder"] = output_encoder(**WORKER_OPTIONS["output"])
+    use_surface_lut(WORKER_OPTIONS["surface_lut"])
+
+def staged_path(path):
+    return path + ".tmp"
+
+def build_variant(job):
+    """
+    Build the requested outputs ({(template key, mode): output path}) of one spec. The dark
+    palette and each mode's palette are derived once, unless the job already carries them from
+    the persisted state, and shared by every template.
+    """
+    color_name, spec, light_accent, outputs, known_palettes = job
+    profile, audit, encoder = WORKER_OPTIONS["profile"], WORKER_OPTIONS["audit"], WORKER_OPTIONS["encoder"]
+    palettes = dict(known_palettes)
+    results = []
+    for (template, mode), output_path in outputs.items():
+        name = output_name(color_name, mode, template)
+        theme_label = f"{DISPLAY_NAME} {name}"
+        if profile:
+            start_profile()
+        try:
+            if "dark" not in palettes:
+                palettes["dark"] = profiled("palette", build_role_palette, spec)
+            if mode not in palettes:
+                palettes[mode] = profiled("mode", mode_palette, palettes["dark"], mode)
+            result = {"name": name, "label": theme_label, "path": output_path, "error": None}
+            theme_data, metrics, violations = render_variant(
+                WORKER_PLANS[template], theme_label, palettes[mode], light_accent, audit, mode
+            )
+            if WORKER_OPTIONS["check"]:
+                sha256, size = profiled("serialize", stream_json, theme_data, None, encoder)
+                result["check"] = profiled("check", check_content, theme_data, output_path, sha256, size)
+            else:
+                sha256, size = profiled(
+                    "serialize", stream_json, theme_data, staged_path(output_path), encoder
+                )
+            if WORKER_OPTIONS["cvd"]:
+                result["cvd"] = cvd_colors(theme_data, mode)
+            result.update({"sha256": sha256, "size": size, "metrics": metrics, "audit": violations})
+            if mode not in known_palettes:
+                result["palette"] = palettes[mode]
+        except ValueError as error:
+            result = {"name": name, "label": theme_label, "path": output_path, "error": str(error)}
+        if profile:
+            result["profile"] = finish_profile()
+        results.append(result)
+    return results
+
+def build_variants(plans, variant_jobs, jobs=1, options=None):
+    """
+    Build (name, spec, light_accent, {(template key, mode): output path}, {mode: known
+    palette}) variants, in the given order, on up to `jobs` processes. Returns one result
+    per output; results for palettes that were not known carry the derived "palette".
+
+    The compiled plans ({template key: plan}) and the VARIANT_OPTIONS overrides in `options`
+    are handed to each worker once, and a job carries every template and mode of one spec, so
+    its palettes are derived once. Each worker streams its theme to a staged file next to the
+    output (see staged_path), so no theme is held in memory and no shipped file is replaced
+    until commit_staged_output. Validation failures are returned as results with an "error"
+    message instead of stopping the remaining variants; the options add "profile", "audit",
+    "check" and "cvd" entries to each result.
+    """
+    initargs = (plans, options)
+    if jobs <= 1 or len(variant_jobs) <= 1:
+        init_variant_worker(*initargs)
+        return [result for job in variant_jobs for result in build_variant(job)]
+
+    # Imported here: multiprocessing and its logging import are most of a cold start.
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = min(jobs, len(variant_jobs))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_variant_worker, initargs=initargs) as pool:
+        chunksize = max(1, len(variant_jobs) // (jobs * 4))
+        return [result for results in pool.map(build_variant, variant_jobs, chunksize=chunksize) for result in results]
+
+# ─────────────────────────────────────────────────────────────
+#  SPEC CATALOGS
+# ─────────────────────────────────────────────────────────────
+CATALOG_EXTENSIONS = (".json", ".jsonl", ".toml")
+SPEC_REQUIRED_KEYS = (
+    "surface_seed",
+    "accent_primary",
+    "accent_warning",
+    "accent_info",
+    "accent_added",
+    "accent_error",
+)
+
+def builtin_catalog():
+    for name, spec in THEME_SPECS.items():
+        yield name, spec, LIGHT_ACCENT_COLORS.get(name)
+
+def catalog_files(path):
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, f) for f in os.listdir(path) if f.endswith(CATALOG_EXTENSIONS)
+        )
+    return [path]
+
+def catalog_entry(name, spec, source):
+    missing = [key for key in SPEC_REQUIRED_KEYS if key not in spec]
+    if missing:
+        raise ValueError(f"{source}: {name} is missing {', '.join(missing)}")
+    spec = dict(spec)
+    light_accent = spec.pop("light_accent", None)
+    return name, spec, light_accent
+
+def read_catalog_file(path):
+    """
+    Yield (name, spec, light_accent) from one catalog file.
+
+    .json and .toml files map variant names to THEME_SPECS-style specs with an optional
+    "light_accent"; .jsonl files hold one {"name", "spec", "light_accent"} record per line
+    (the --explore output) and are read line by line.
+    """
+    if path.endswith(".jsonl"):
+        with open(path, "r") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                spec = {**record["spec"], "light_accent": record.get("light_accent")}
+                yield catalog_entry(record["name"], spec, f"{path}:{line_number}")
+        return
+
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError(f"{path}: TOML catalogs need Python 3.11 or newer")
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, "r") as f:
+            data = json.load(f)
+    for name, spec in data.items():
+        yield catalog_entry(name, spec, path)
+
+def iter_catalog(paths=None):
+    """Stream variants from catalog files/directories in order, or THEME_SPECS without any."""
+    if not paths:
+        yield from builtin_catalog()
+        return
+
+    seen = set()
+    for path in paths:
+        for file_path in catalog_files(path):
+            for name, spec, light_accent in read_catalog_file(file_path):
+                # Output filenames are lower-cased, so names must be unique case-insensitively.
+                if name.lower() in seen:
+                    raise ValueError(f"{file_path}: duplicate variant {name}")
+                seen.add(name.lower())
+                yield name, spec, light_accent
+
+def select_variants(entries, only=None, match=None):
+    """Keep entries named in `only` or matching a glob in `match` (case-insensitive); all without either."""
+    only = {name.lower() for name in only or ()}
+    patterns = [pattern.lower() for pattern in match or ()]
+    for entry in entries:
+        name = entry[0].lower()
+        if not only and not patterns:
+            yield entry
+        elif name in only or any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+            yield entry
+
+def stale_generated_files(themes_dir, filenames, manifest, source):
+    """
+    Generated theme files a full build from `source` (see catalog_source) would remove: those
+    not among `filenames` that the manifest records for the same source. THEME_SPECS also
+    claims files the manifest does not record, so a catalog build never removes the built-in
+    themes or another catalog's, and the template source is always kept.
+    """
+    expected = set(filenames.values()) | {staged_path(filename) for filename in filenames.values()}
+    owners = {entry["file"]: entry.get("catalog") for entry in manifest.values() if "file" in entry}
+    return [
+        f for f in sorted(os.listdir(themes_dir))
+        if f.startswith("color-sea-") and f.endswith((".json", ".json.tmp"))
+        and f not in expected and not is_template_file(f)
+        and owners.get(f[:-len(".tmp")] if f.endswith(".tmp") else f) == source
+    ]
+
+def catalog_source(paths=None):
+    """The manifest's record of where specs came from: None for THEME_SPECS, else the catalog paths."""
+    return sorted(os.path.abspath(path) for path in paths) if paths else None
+
+def merge_theme_entries(existing, generated, keep):
+    """
+    Update package.json theme contributions in place of rewriting them: entries for
+    generated paths are replaced where they stand, other entries are kept while keep(entry)
+    holds, and new paths are appended in generation order.
+    """
+    pending = {entry["path"]: entry for entry in generated}
+    merged = []
+    for entry in existing:
+        path = entry.get("path")
+        if path in pending:
+            merged.append(pending.pop(path))
+        elif keep(entry):
+            merged.append(entry)
+    return merged + [entry for entry in generated if entry["path"] in pending]
+
+# ─────────────────────────────────────────────────────────────
+#  SURFACE LOOKUP TABLE
+# ─────────────────────────────────────────────────────────────
+# Surfaces depend only on the seed's hue and capped saturation, so they can be solved once on a
+# dense grid. Cells hold packed BG_DEEP, BG_EDITOR, BG_MID; the last saturation row is the cap.
+SURFACE_LUT_HUE_STEP = 1.0
+SURFACE_LUT_SATURATION_STEP = 0.5
+SURFACE_LUT_SHAPE = (
+    round(360 / SURFACE_LUT_HUE_STEP),
+    math.ceil(RUBY_SURFACE_MODEL["deep_saturation_cap"] / SURFACE_LUT_SATURATION_STEP) + 1,
+)
+SURFACE_LUT_VERSION = 2   # bump when solve_surface_roles or its tuning code changes
+SURFACE_LUT_HEADER = struct.Struct("<4sIII32s")   # magic, version, hues, saturations, model digest
+SURFACE_LUT_UNSOLVABLE = 0xFFFFFFFF
+SURFACE_ROLES = ("BG_DEEP", "BG_EDITOR", "BG_MID")
+
+SURFACE_LUT = None
+
+def surface_lut_magic():
+    # Cells are stored in native byte order; a table from the other order is simply rebuilt.
+    return b"SLUT" if sys.byteorder == "little" else b"TULS"
+
+def surface_lut_path(script_dir):
+    return os.path.join(script_dir, CACHE_DIRNAME, "surface-lut.bin")
+
+def surface_lut_digest():
+    """Hash everything the table's cells depend on, so edits elsewhere in the script keep it."""
+    model = [
+        SURFACE_LUT_HUE_STEP, SURFACE_LUT_SATURATION_STEP, RUBY_SURFACE_MODEL, SURFACE_VALIDATION,
+        LIGHTNESS_SEARCH_RANGE, HSL_SEARCH_STEP, HSL_TOLERANCE, CHROMA_FIXUP_LIMIT,
+    ]
+    return hash_parts(json.dumps(model, sort_keys=True))
+
+def surface_lut_axes():
+    hue_count, saturation_count = SURFACE_LUT_SHAPE
+    cap = RUBY_SURFACE_MODEL["deep_saturation_cap"]
+    hues = [index * SURFACE_LUT_HUE_STEP for index in range(hue_count)]
+    saturations = [min(index * SURFACE_LUT_SATURATION_STEP, cap) for index in range(saturation_count)]
+    return hues, saturations
+
+def surface_lut_cell(hue, saturation, exact=False):
+    """
+    Return the table cell for a hue and capped saturation: the nearest grid point, or with
+    exact=True None unless both lie exactly on the grid.
+    """
+    hue_count, saturation_count = SURFACE_LUT_SHAPE
+    hue_position = hue / SURFACE_LUT_HUE_STEP
+    saturation_position = saturation / SURFACE_LUT_SATURATION_STEP
+    if saturation == RUBY_SURFACE_MODEL["deep_saturation_cap"]:
+        saturation_position = float(saturation_count - 1)
+    if exact and not (hue_position.is_integer() and saturation_position.is_integer()):
+        return None
+    hue_index = round(hue_position) % hue_count
+    return hue_index * saturation_count + min(round(saturation_position), saturation_count - 1)
+
+def surface_lut_roles(cell):
+    """Return the installed table's surfaces for a cell, or None if the cell was unsolvable."""
+    offset = cell * len(SURFACE_ROLES)
+    packed = SURFACE_LUT[offset:offset + len(SURFACE_ROLES)]
+    if packed[0] == SURFACE_LUT_UNSOLVABLE:
+        return None
+    return {role: f"#{value:06x}" for role, value in zip(SURFACE_ROLES, packed)}
+
+def surface_lut_row(hue):
+    row = []
+    for saturation in surface_lut_axes()[1]:
+        try:
+            surfaces = solve_surface_roles(hue, saturation)
+        except ValueError:
+            row += [SURFACE_LUT_UNSOLVABLE] * len(SURFACE_ROLES)
+            continue
+        row += [to_packed(surfaces[role]) for role in SURFACE_ROLES]
+    return row
+
+def build_surface_lut(lut_path, jobs=1):
+    """Solve every grid cell, one hue row per task on up to `jobs` processes, and write the table."""
+    hues, saturations = surface_lut_axes()
+    table = array.array("I")
+    for row in streamed_map(surface_lut_row, hues, jobs, clear_color_caches, ()):
+        table.extend(row)
+
+    os.makedirs(os.path.dirname(lut_path), exist_ok=True)
+    staged = staged_path(lut_path)
+    with open(staged, "wb") as f:
+        f.write(SURFACE_LUT_HEADER.pack(
+            surface_lut_magic(), SURFACE_LUT_VERSION, len(hues), len(saturations), bytes.fromhex(surface_lut_digest())
+        ))
+        table.tofile(f)
+    os.replace(staged, lut_path)
+    unsolvable = table[::len(SURFACE_ROLES)].count(SURFACE_LUT_UNSOLVABLE)
+    return len(hues) * len(saturations), unsolvable
+
+def load_surface_lut(lut_path):
+    """
+    Memory-map a table written by build_surface_lut and return its cells as a flat memoryview,
+    or None if it is missing or was built for another grid, surface model or solver version.
+    """
+    try:
+        with open(lut_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    hue_count, saturation_count = SURFACE_LUT_SHAPE
+    expected = (surface_lut_magic(), SURFACE_LUT_VERSION, hue_count, saturation_count, bytes.fromhex(surface_lut_digest()))
+    size = SURFACE_LUT_HEADER.size + hue_count * saturation_count * len(SURFACE_ROLES) * 4
+    if len(mapped) != size or SURFACE_LUT_HEADER.unpack_from(mapped) != expected:
+        mapped.close()
+        return None
+    return memoryview(mapped)[SURFACE_LUT_HEADER.size:].cast("I")
+
+def use_surface_lut(lut_path):
+    """Install the table at lut_path (or none) for build_surface_roles and explore lookups."""
+    global SURFACE_LUT
+    SURFACE_LUT = load_surface_lut(lut_path) if lut_path else None
+    return SURFACE_LUT
+
+# ─────────────────────────────────────────────────────────────
+#  PALETTE EXPLORATION
+# ─────────────────────────────────────────────────────────────
+EXPLORE_CHUNK_SIZE = 256
+EXPLORE_NEUTRAL_CACHE = 4096
+
+WORKER_VALIDATION_ROLES = None
+WORKER_NEUTRALS = {}
+WORKER_DISTINCT = None
+
+def validation_color_roles(plan):
+    """Map each color key validate_theme reads to (palette role, template literal)."""
+    roles = {key: (None, plan["skeleton"]["colors"].get(key)) for key in VALIDATION_KEYS}
+    for path, role, alpha in plan["slots"]:
+        if len(path) == 2 and path[0] == "colors" and path[1] in roles:
+            roles[path[1]] = (role, alpha)
+    return roles
+
+def init_explore_worker(plan, distinct=None, surface_lut=None):
+    global WORKER_VALIDATION_ROLES, WORKER_DISTINCT
+    init_variant_worker({"": plan}, {"surface_lut": surface_lut})
+    WORKER_VALIDATION_ROLES = validation_color_roles(plan)
+    WORKER_DISTINCT = distinct
+    WORKER_NEUTRALS.clear()
+
+def cached_neutral_palette(surface_seed, nearest=False):
+    """
+    Surfaces and neutrals depend only on the seed's hue and capped saturation. With nearest=True
+    and a surface table installed, the nearest table cell stands in for the exact solve.
+    """
+    hue, saturation, _ = hex_to_hsl(surface_seed)
+    saturation = min(saturation, RUBY_SURFACE_MODEL["deep_saturation_cap"])
+    key = (hue, saturation)
+    if nearest and SURFACE_LUT is not None:
+        key = surface_lut_cell(hue, saturation)
+    if key not in WORKER_NEUTRALS:
+        if len(WORKER_NEUTRALS) >= EXPLORE_NEUTRAL_CACHE:
+            WORKER_NEUTRALS.clear()
+        try:
+            if isinstance(key, int):
+                surfaces = surface_lut_roles(key)
+                WORKER_NEUTRALS[key] = surfaces and neutral_palette(surfaces)
+            else:
+                WORKER_NEUTRALS[key] = build_neutral_palette(surface_seed)
+        except ValueError:
+            WORKER_NEUTRALS[key] = None
+    return WORKER_NEUTRALS[key]
+
+def accent_pools():
+    keys = [key for key in next(iter(THEME_SPECS.values())) if key != "surface_seed"]
+    return {
+        key: sorted({spec[key] for spec in THEME_SPECS.values() if key in spec})
+        for key in keys
+    }
+
+def explore_candidates(mode, count=0, grid=(36, 10, 1), seed=0):
+    """
+    Lazily yield (name, spec, light_accent) candidates.
+
+    "grid" crosses evenly spaced surface seed hue/saturation/lightness steps with every
+    existing variant's accent set; "random" draws `count` seeds and per-role accents from the
+    accents used by THEME_SPECS.
+    """
+    if mode == "grid":
+        hue_steps, saturation_steps, lightness_steps = grid
+        accent_sets = [
+            ({key: value for key, value in spec.items() if key != "surface_seed"}, LIGHT_ACCENT_COLORS.get(name))
+            for name, spec in THEME_SPECS.items()
+        ]
+        index = 0
+        for hue_step, saturation_step, lightness_step in itertools.product(
+            range(hue_steps), range(saturation_steps), range(lightness_steps)
+        ):
+            surface_seed = hsl_to_hex(
+                360 * hue_step / hue_steps,
+                100 * (saturation_step + 0.5) / saturation_steps,
+                100 * (lightness_step + 0.5) / lightness_steps,
+            )
+            for accents, light_accent in accent_sets:
+                yield f"Explore{index}", {"surface_seed": surface_seed.upper(), **accents}, light_accent
+                index += 1
+        return
+
+    rng = random.Random(seed)
+    pools = accent_pools()
+    light_pool = sorted(set(LIGHT_ACCENT_COLORS.values()))
+    for index in range(count):
+        surface_seed = hsl_to_hex(rng.uniform(0, 360), rng.uniform(0, 100), rng.uniform(0, 100))
+        spec = {"surface_seed": surface_seed.upper()}
+        for key, pool in pools.items():
+            spec[key] = rng.choice(pool)
+        yield f"Explore{index}", spec, rng.choice(light_pool)
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def explore_chunk(chunk):
+    """
+    Prune a chunk of candidates with one batched validation pass over their palettes, then
+    fully render and validate the survivors, dropping those with near-identical syntax colors
+    when a distinguishability delta is set. With a surface table installed, pruning uses the
+    nearest cell's surfaces and survivors are solved exactly before rendering. Returns
+    (survivor records, counters).
+    """
+    stats = {"candidates": len(chunk), "unsolvable": 0, "pruned": 0, "failed": 0, "indistinct": 0, "survivors": 0}
+    candidates = []
+    for name, spec, light_accent in chunk:
+        neutral = cached_neutral_palette(spec["surface_seed"], nearest=True)
+        if neutral is None:
+            stats["unsolvable"] += 1
+            continue
+        palette = {**neutral, **accent_roles(spec)}
+        colors = {
+            key: palette[role] if role else literal
+            for key, (role, literal) in WORKER_VALIDATION_ROLES.items()
+        }
+        candidates.append((name, spec, light_accent, palette, colors))
+
+    foregrounds, backgrounds = [], []
+    for *_, colors in candidates:
+        pair_foregrounds, pair_backgrounds = validation_pairs(colors)
+        foregrounds += pair_foregrounds
+        backgrounds += pair_backgrounds
+    comparison = compare_colors(foregrounds, backgrounds) if candidates else None
+
+    records = []
+    for index, (name, spec, light_accent, palette, _) in enumerate(candidates):
+        window = slice(index * VALIDATION_PAIR_COUNT, (index + 1) * VALIDATION_PAIR_COUNT)
+        errors, _ = validation_errors(
+            comparison["contrast"][window],
+            comparison["oklab_delta"][window],
+            comparison["hue_distance"][window],
+        )
+        if errors:
+            stats["pruned"] += 1
+            continue
+        if SURFACE_LUT is not None:
+            neutral = cached_neutral_palette(spec["surface_seed"])
+            if neutral is None:
+                stats["unsolvable"] += 1
+                continue
+            palette = {**neutral, **accent_roles(spec)}
+        theme_data = render_theme(WORKER_PLAN, f"{DISPLAY_NAME} {name}", palette, light_accent)
+        try:
+            metrics = validate_theme(name, theme_data)
+        except ValueError:
+            stats["failed"] += 1
+            continue
+        if WORKER_DISTINCT and color_collisions(theme_data, WORKER_DISTINCT):
+            stats["indistinct"] += 1
+            continue
+        stats["survivors"] += 1
+        records.append({
+            "name": name,
+            "margin": metrics["margin"],
+            "spec": spec,
+            "light_accent": light_accent,
+            "metrics": metrics,
+        })
+    return records, stats
+
+def streamed_map(function, iterable, jobs, initializer, initargs):
+    """
+    Yield function(item) in input order, keeping at most 2 * jobs items in flight so the
+    input is consumed lazily instead of being submitted all at once.
+    """
+    if jobs <= 1:
+        initializer(*initargs)
+        yield from map(function, iterable)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for item in iterable:
+            pending.append(pool.submit(function, item))
+            if len(pending) >= jobs * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def explore(args, script_dir, source_path):
+    with open(source_path, "r") as f:
+        plan = compile_template(parse_template(f.read()))
+
+    output_path = args.explore_output or os.path.join(script_dir, CACHE_DIRNAME, "explore.jsonl")
+    ranked_path = os.path.splitext(output_path)[0] + "-ranked.json"
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    candidates = explore_candidates(
+        args.explore,
+        count=args.explore_count,
+        grid=tuple(int(part) for part in args.explore_grid.split(",")),
+        seed=args.explore_seed,
+    )
+    lut_path = surface_lut_path(script_dir)
+    if load_surface_lut(lut_path) is None:
+        print(f"💡 Run with --build-surface-lut to look surfaces up in {CACHE_DIRNAME}/surface-lut.bin")
+        lut_path = None
+    print(f"🧭 Exploring {args.explore} candidates on {args.jobs} process(es)...")
+    totals = {"candidates": 0, "unsolvable": 0, "pruned": 0, "failed": 0, "indistinct": 0, "survivors": 0}
+    top = []
+    started = time.perf_counter()
+
+    with open(output_path, "w") as out:
+        chunks = chunked(candidates, EXPLORE_CHUNK_SIZE)
+        for records, stats in streamed_map(
+            explore_chunk, chunks, args.jobs, init_explore_worker, (plan, args.distinct, lut_path)
+        ):
+            for record in records:
+                out.write(json.dumps(record) + "\n")
+                entry = (record["margin"], -int(record["name"][len("Explore"):]), record)
+                if len(top) < args.explore_top:
+                    heapq.heappush(top, entry)
+                elif entry[:2] > top[0][:2]:
+                    heapq.heapreplace(top, entry)
+            for key, value in stats.items():
+                totals[key] += value
+
+    ranked = [entry[2] for entry in sorted(top, key=lambda entry: entry[:2], reverse=True)]
+    with open(ranked_path, "w") as f:
+        json.dump(
+            {record["name"]: {**record["spec"], "light_accent": record["light_accent"]} for record in ranked},
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+    elapsed = time.perf_counter() - started
+    rate = totals["candidates"] / elapsed if elapsed else 0.0
+    print(
+        f"   {totals['candidates']} candidates in {elapsed:.1f}s ({rate:.0f}/s): "
+        f"{totals['unsolvable']} unsolvable surfaces, {totals['pruned']} pruned, "
+        f"{totals['failed']} failed full validation, "
+        + (f"{totals['indistinct']} with colliding syntax colors, " if args.distinct else "")
+        + f"{totals['survivors']} survived"
+    )
+    print(f"\n🏆 Top {len(ranked)} by contrast margin:")
+    for record in ranked:
+        print(
+            f"   {record['name']:<14} margin={record['margin']:+.3f} "
+            f"seed={record['spec']['surface_seed']} primary={record['spec']['accent_primary']}"
+        )
+    print(f"\n💾 Survivors streamed to {output_path}")
+    print(f"   Ranked catalog written to {ranked_path}")
+
+def hash_parts(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def generator_fingerprint(template_bytes, output_options=None):
+    with open(os.path.abspath(__file__), "rb") as f:
+        script_bytes = f.read()
+    model = json.dumps(
+        [SOURCE_COLORS, SURFACE_VALIDATION, TEXT_VALIDATION, NEUTRAL_SATURATION_LIMITS, output_options or {}],
+        sort_keys=True,
+    )
+    return hash_parts(str(CACHE_VERSION), script_bytes, template_bytes, model)
+
+def variant_cache_key(fingerprint, color_name, spec, light_accent=None, mode="dark"):
+    entry = [color_name, spec, light_accent] + ([] if mode == "dark" else [mode])
+    entry = json.dumps(entry, sort_keys=True)
+    return hash_parts(fingerprint, entry)
+
+def load_build_cache(cache_path):
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("variants", {})
+
+def save_build_cache(cache_path, variants):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    content = json.dumps({"version": CACHE_VERSION, "variants": variants}, indent=2, sort_keys=True) + "\n"
+    return write_if_changed(cache_path, content)
+
+def script_digest():
+    with open(os.path.abspath(__file__), "rb") as f:
+        return hash_parts(f.read())
+
+def load_compiled_state(state_path, script_hash):
+    """
+    Load the persisted compiled state: {"plans": {template hash: plan}, "palettes":
+    {palette_state_key: palette}}. Any version or script change, or state_path=None
+    (--no-cache), starts from an empty state.
+    """
+    state = None
+    try:
+        if state_path:
+            with open(state_path, "rb") as f:
+                state = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, IndexError, ValueError):
+        pass
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION or state.get("script") != script_hash:
+        return {"version": STATE_VERSION, "script": script_hash, "plans": {}, "palettes": {}}
+    return state
+
+def save_compiled_state(state_path, state):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    staged = staged_path(state_path)
+    with open(staged, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(staged, state_path)
+
+def palette_state_key(spec, mode="dark"):
+    return hash_parts(json.dumps(spec, sort_keys=True), mode)
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def cached_output_current(entry, key, filepath):
+    """Whether a cache entry matches the key and the file on disk still holds its output."""
+    if not entry or entry.get("key") != key:
+        return False
+    try:
+        if file_stamp(filepath) == entry.get("stamp"):
+            return True
+        with open(filepath, "rb") as f:
+            current = hash_parts(f.read()) == entry.get("sha256")
+    except OSError:
+        return False
+    if current:
+        entry["stamp"] = file_stamp(filepath)
+    return current
+
+def commit_staged_output(path, sha256, size):
+    """Move a staged output over `path` unless `path` already holds the same bytes."""
+    staged = staged_path(path)
+    try:
+        if os.path.getsize(path) == size:
+            with open(path, "rb") as f:
+                if hash_parts(f.read()) == sha256:
+                    os.remove(staged)
+                    return False
+    except OSError:
+        pass
+    os.replace(staged, path)
+    return True
+
+def discard_staged_outputs(results):
+    for result in results:
+        try:
+            os.remove(staged_path(result["path"]))
+        except OSError:
+            pass
+
+def format_size(size):
+    return f"{size / 1024:.1f} KB" if size >= 1024 else f"{size} B"
+
+def write_if_changed(path, content):
+    data = content.encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+def template_key(path):
+    """
+    Output suffix for a template: "" for color-sea-template.json, "compact" for
+    color-sea-template-compact.json, and the file's stem for any other name.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem == TEMPLATE_STEM:
+        return ""
+    return stem[len(TEMPLATE_STEM) + 1:] if stem.startswith(TEMPLATE_STEM + "-") else stem.lower()
+
+def is_template_file(filename):
+    return filename.startswith(TEMPLATE_STEM) and filename.endswith(".json")
+
+def output_name(name, mode="dark", template=""):
+    suffix = " " + template.replace("-", " ").replace("_", " ").title() if template else ""
+    return name + MODES[mode]["name_suffix"] + suffix
+
+def theme_filename(name, mode="dark", template=""):
+    return f"color-sea-{name.lower()}{MODES[mode]['file_suffix']}{'-' + template if template else ''}.json"
+
+def plan_outputs(names, templates=("",), modes=("dark",)):
+    """
+    Return ({output name: (name, mode, template)}, {output name: filename}) for every spec in
+    every template and mode. A template suffix can spell a mode suffix (a "-light" template, or
+    a spec named "Blue Light"), so outputs that would share a name or a file are rejected.
+    """
+    outputs, filenames, claimed = {}, {}, {}
+    for name in names:
+        for template in templates:
+            for mode in modes:
+                output = output_name(name, mode, template)
+                filename = theme_filename(name, mode, template)
+                for taken in (output.lower(), filename):
+                    if taken in claimed:
+                        other = claimed[taken]
+                        raise ValueError(
+                            f"{describe_output(name, mode, template)} and {describe_output(*other)} "
+                            f"would both write {output if taken == output.lower() else filename}"
+                        )
+                    claimed[taken] = (name, mode, template)
+                outputs[output] = (name, mode, template)
+                filenames[output] = filename
+    return outputs, filenames
+
+def describe_output(name, mode, template):
+    return f"{name} ({mode}{', template ' + template if template else ''})"
+
+def theme_contribution(name, mode="dark", template=""):
+    return {
+        "label": f"{DISPLAY_NAME} {output_name(name, mode, template)}",
+        "uiTheme": MODES[mode]["uiTheme"],
+        "path": f"./themes/{theme_filename(name, mode, template)}"
+    }
+
+def parse_modes(text):
+    modes = [mode.strip() for mode in text.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown or not modes:
+        raise argparse.ArgumentTypeError(f"modes must be a comma-separated subset of {', '.join(MODES)}")
+    return list(dict.fromkeys(modes))
+
+def package_json_content(script_dir, generated_themes):
+    """Return package.json as update_package_json would write it, without writing it."""
+    pkg_path = os.path.join(script_dir, "package.json")
+    with open(pkg_path, "r") as f:
+        pkg = json.load(f)
+
+    # Update metadata
+    pkg["name"] = EXTENSION_NAME
+    pkg["displayName"] = DISPLAY_NAME
+    pkg["publisher"] = PUBLISHER_NAME
+    pkg["description"] = "A collection of vibrant, deep dark themes for VS Code."
+    pkg["repository"]["url"] = REPO_URL
+    pkg["homepage"] = f"{REPO_URL}/blob/main/README.md"
+    pkg["bugs"]["url"] = f"{REPO_URL}/issues"
+
+    # Merge generated themes into the existing list (template sources are never listed)
+    pkg["contributes"]["themes"] = merge_theme_entries(
+        pkg["contributes"].get("themes", []),
+        generated_themes,
+        keep=lambda entry: not is_template_file(os.path.basename(entry.get("path", "")))
+        and os.path.exists(os.path.join(script_dir, entry.get("path", ""))),
+    )
+    return pkg
+
+def update_package_json(script_dir, generated_themes):
+    pkg = package_json_content(script_dir, generated_themes)
+    return pkg, write_if_changed(os.path.join(script_dir, "package.json"), json.dumps(pkg, indent=2) + "\n")
+
+# ─────────────────────────────────────────────────────────────
+#  SYNTAX PREVIEW
+# ─────────────────────────────────────────────────────────────
+PREVIEW_FORMATS = {"ansi": ".ans", "html": ".html"}
+PREVIEW_FONT_STYLES = ("bold", "italic", "underline", "strikethrough")
+ANSI_FONT_CODES = {"bold": "1", "italic": "3", "underline": "4", "strikethrough": "9"}
+
+# There is no grammar engine here, so the samples are stored already tokenized: each token is
+# (text, scopes below the file's root scope[, semantic token type.modifiers]), as VS Code's
+# TextMate grammars and language servers would report them.
+PREVIEW_SAMPLES = {
+    "sample.py": ("python", "source.python", [
+        [
+            ("#", "comment.line.number-sign.python punctuation.definition.comment.python"),
+            (" Blend a color over the editor background.", "comment.line.number-sign.python"),
+        ],
+        [
+            ("@", "meta.function.decorator.python entity.name.function.decorator.python punctuation.definition.decorator.python"),
+            ("lru_cache", "meta.function.decorator.python entity.name.function.decorator.python", "decorator"),
+            ("(", "meta.function.decorator.python punctuation.definition.arguments.begin.python"),
+            ("maxsize", "meta.function.decorator.python meta.function-call.arguments.python variable.parameter.function-call.python"),
+            ("=", "meta.function.decorator.python meta.function-call.arguments.python keyword.operator.assignment.python"),
+            ("None", "meta.function.decorator.python meta.function-call.arguments.python constant.language.python"),
+            (")", "meta.function.decorator.python punctuation.definition.arguments.end.python"),
+        ],
+        [
+            ("def", "meta.function.python storage.type.function.python"),
+            (" ", "meta.function.python"),
+            ("blend", "meta.function.python entity.name.function.python", "function.declaration"),
+            ("(", "meta.function.python meta.function.parameters.python punctuation.definition.parameters.begin.python"),
+            ("top", "meta.function.python meta.function.parameters.python variable.parameter.function.language.python", "parameter.declaration"),
+            (":", "meta.function.python meta.function.parameters.python punctuation.separator.annotation.python"),
+            (" ", "meta.function.python meta.function.parameters.python"),
+            ("str", "meta.function.python meta.function.parameters.python support.type.python", "class.defaultLibrary"),
+            (",", "meta.function.python meta.function.parameters.python punctuation.separator.parameters.python"),
+            (" ", "meta.function.python meta.function.parameters.python"),
+            ("alpha", "meta.function.python meta.function.parameters.python variable.parameter.function.language.python", "parameter.declaration"),
+            ("=", "meta.function.python meta.function.parameters.python keyword.operator.python"),
+            ("0.5", "meta.function.python meta.function.parameters.python constant.numeric.float.python"),
+            (")", "meta.function.python meta.function.parameters.python punctuation.definition.parameters.end.python"),
+            (":", "meta.function.python punctuation.section.function.begin.python"),
+        ],
+        [
+            ("    ", ""),
+            ('"""', "string.quoted.docstring.multi.python punctuation.definition.string.begin.python"),
+            ("Return the blended #rrggbb color.", "string.quoted.docstring.multi.python"),
+            ('"""', "string.quoted.docstring.multi.python punctuation.definition.string.end.python"),
+        ],
+        [
+            ("    ", ""),
+            ("if", "keyword.control.flow.python"),
+            (" ", ""),
+            ("not", "keyword.operator.logical.python"),
+            (" ", ""),
+            ("top", "variable.other.python", "parameter"),
+            (".", "punctuation.separator.period.python"),
+            ("startswith", "meta.member.access.python meta.function-call.python meta.function-call.generic.python", "method.defaultLibrary"),
+            ("(", "meta.member.access.python meta.function-call.python punctuation.definition.arguments.begin.python"),
+            ('"', "meta.member.access.python meta.function-call.python meta.function-call.arguments.python string.quoted.single.python punctuation.definition.string.begin.python"),
+            ("#", "meta.member.access.python meta.function-call.python meta.function-call.arguments.python string.quoted.single.python"),
+            ('"', "meta.member.access.python meta.function-call.python meta.function-call.arguments.python string.quoted.single.python punctuation.definition.string.end.python"),
+            (")", "meta.member.access.python meta.function-call.python punctuation.definition.arguments.end.python"),
+            (":", "punctuation.separator.colon.python"),
+        ],
+        [
+            ("        ", ""),
+            ("raise", "keyword.control.flow.python"),
+            (" ", ""),
+            ("ValueError", "meta.function-call.python support.type.exception.python", "class.defaultLibrary"),
+            ("(", "meta.function-call.python punctuation.definition.arguments.begin.python"),
+            ("f", "meta.function-call.python meta.function-call.arguments.python meta.fstring.python string.interpolated.python storage.type.string.python"),
+            ('"', "meta.function-call.python meta.function-call.arguments.python meta.fstring.python string.interpolated.python punctuation.definition.string.begin.python"),
+            ("bad color ", "meta.function-call.python meta.function-call.arguments.python meta.fstring.python string.interpolated.python"),
+            ("{", "meta.function-call.python meta.function-call.arguments.python meta.fstring.python constant.character.format.placeholder.other.python"),
+            ("top", "meta.function-call.python meta.function-call.arguments.python meta.fstring.python source.python", "parameter"),
+            ("!r", "meta.function-call.python meta.function-call.arguments.python meta.fstring.python storage.type.format.python"),
+            ("}", "meta.function-call.python meta.function-call.arguments.python meta.fstring.python constant.character.format.placeholder.other.python"),
+            ('"', "meta.function-call.python meta.function-call.arguments.python meta.fstring.python string.interpolated.python punctuation.definition.string.end.python"),
+            (")", "meta.function-call.python punctuation.definition.arguments.end.python"),
+        ],
+        [
+            ("    ", ""),
+            ("return", "keyword.control.flow.python"),
+            (" ", ""),
+            ("BASE", "constant.other.caps.python", "variable.readonly"),
+            (" ", ""),
+            ("|", "keyword.operator.bitwise.python"),
+            (" ", ""),
+            ("int", "meta.function-call.python support.function.builtin.python", "function.defaultLibrary"),
+            ("(", "meta.function-call.python punctuation.definition.arguments.begin.python"),
+            ("top", "meta.function-call.python meta.function-call.arguments.python variable.other.python", "parameter"),
+            ("[", "meta.function-call.python meta.function-call.arguments.python meta.item-access.python punctuation.definition.arguments.begin.python"),
+            ("1", "meta.function-call.python meta.function-call.arguments.python meta.item-access.python constant.numeric.dec.python"),
+            (":", "meta.function-call.python meta.function-call.arguments.python meta.item-access.python punctuation.separator.slice.python"),
+            ("]", "meta.function-call.python meta.function-call.arguments.python meta.item-access.python punctuation.definition.arguments.end.python"),
+            (",", "meta.function-call.python meta.function-call.arguments.python punctuation.separator.arguments.python"),
+            (" ", "meta.function-call.python meta.function-call.arguments.python"),
+            ("16", "meta.function-call.python meta.function-call.arguments.python constant.numeric.dec.python"),
+            (")", "meta.function-call.python punctuation.definition.arguments.end.python"),
+            (" ", ""),
+            ("*", "keyword.operator.arithmetic.python"),
+            (" ", ""),
+            ("alpha", "variable.other.python", "parameter"),
+        ],
+    ]),
+    "sample.ts": ("typescript", "source.ts", [
+        [
+            ("import", "meta.import.ts keyword.control.import.ts"),
+            (" ", "meta.import.ts"),
+            ("{", "meta.import.ts meta.block.ts punctuation.definition.block.ts"),
+            (" ", "meta.import.ts meta.block.ts"),
+            ("readFile", "meta.import.ts meta.block.ts variable.other.readwrite.alias.ts", "function"),
+            (" ", "meta.import.ts meta.block.ts"),
+            ("}", "meta.import.ts meta.block.ts punctuation.definition.block.ts"),
+            (" ", "meta.import.ts"),
+            ("from", "meta.import.ts keyword.control.from.ts"),
+            (" ", "meta.import.ts"),
+            ('"', "meta.import.ts string.quoted.double.ts punctuation.definition.string.begin.ts"),
+            ("fs/promises", "meta.import.ts string.quoted.double.ts"),
+            ('"', "meta.import.ts string.quoted.double.ts punctuation.definition.string.end.ts"),
+            (";", "punctuation.terminator.statement.ts"),
+        ],
+        [],
+        [
+            ("export", "meta.class.ts keyword.control.export.ts"),
+            (" ", "meta.class.ts"),
+            ("class", "meta.class.ts storage.type.class.ts"),
+            (" ", "meta.class.ts"),
+            ("Palette", "meta.class.ts entity.name.type.class.ts", "class.declaration"),
+            ("<", "meta.class.ts meta.type.parameters.ts punctuation.definition.typeparameters.begin.ts"),
+            ("T", "meta.class.ts meta.type.parameters.ts entity.name.type.ts", "typeParameter.declaration"),
+            (" ", "meta.class.ts meta.type.parameters.ts"),
+            ("extends", "meta.class.ts meta.type.parameters.ts storage.modifier.ts"),
+            (" ", "meta.class.ts meta.type.parameters.ts"),
+            ("string", "meta.class.ts meta.type.parameters.ts support.type.primitive.ts"),
+            (">", "meta.class.ts meta.type.parameters.ts punctuation.definition.typeparameters.end.ts"),
+            (" ", "meta.class.ts"),
+            ("{", "meta.class.ts punctuation.definition.block.ts"),
+        ],
+        [
+            ("  ", "meta.class.ts"),
+            ("private", "meta.class.ts meta.field.declaration.ts storage.modifier.ts"),
+            (" ", "meta.class.ts meta.field.declaration.ts"),
+            ("readonly", "meta.class.ts meta.field.declaration.ts storage.modifier.ts"),
+            (" ", "meta.class.ts meta.field.declaration.ts"),
+            ("cache", "meta.class.ts meta.field.declaration.ts meta.definition.property.ts variable.object.property.ts", "property.declaration.readonly"),
+            (" ", "meta.class.ts meta.field.declaration.ts"),
+            ("=", "meta.class.ts meta.field.declaration.ts keyword.operator.assignment.ts"),
+            (" ", "meta.class.ts meta.field.declaration.ts"),
+            ("new", "meta.class.ts meta.field.declaration.ts new.expr.ts keyword.operator.new.ts"),
+            (" ", "meta.class.ts meta.field.declaration.ts new.expr.ts"),
+            ("Map", "meta.class.ts meta.field.declaration.ts new.expr.ts entity.name.type.ts", "class.defaultLibrary"),
+            ("<", "meta.class.ts meta.field.declaration.ts new.expr.ts meta.type.parameters.ts punctuation.definition.typeparameters.begin.ts"),
+            ("T", "meta.class.ts meta.field.declaration.ts new.expr.ts meta.type.parameters.ts entity.name.type.ts", "typeParameter"),
+            (",", "meta.class.ts meta.field.declaration.ts new.expr.ts meta.type.parameters.ts punctuation.separator.comma.ts"),
+            (" ", "meta.class.ts meta.field.declaration.ts new.expr.ts meta.type.parameters.ts"),
+            ("number", "meta.class.ts meta.field.declaration.ts new.expr.ts meta.type.parameters.ts support.type.primitive.ts"),
+            (">", "meta.class.ts meta.field.declaration.ts new.expr.ts meta.type.parameters.ts punctuation.definition.typeparameters.end.ts"),
+            ("()", "meta.class.ts meta.field.declaration.ts new.expr.ts meta.brace.round.ts"),
+            (";", "meta.class.ts punctuation.terminator.statement.ts"),
+        ],
+        [
+            ("  ", "meta.class.ts"),
+            ("async", "meta.class.ts meta.method.declaration.ts storage.modifier.async.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts"),
+            ("load", "meta.class.ts meta.method.declaration.ts meta.definition.method.ts entity.name.function.ts", "method.declaration"),
+            ("(", "meta.class.ts meta.method.declaration.ts meta.parameters.ts punctuation.definition.parameters.begin.ts"),
+            ("path", "meta.class.ts meta.method.declaration.ts meta.parameters.ts variable.parameter.ts", "parameter.declaration"),
+            (":", "meta.class.ts meta.method.declaration.ts meta.parameters.ts meta.type.annotation.ts keyword.operator.type.annotation.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.parameters.ts meta.type.annotation.ts"),
+            ("string", "meta.class.ts meta.method.declaration.ts meta.parameters.ts meta.type.annotation.ts support.type.primitive.ts"),
+            (")", "meta.class.ts meta.method.declaration.ts meta.parameters.ts punctuation.definition.parameters.end.ts"),
+            (":", "meta.class.ts meta.method.declaration.ts meta.return.type.ts keyword.operator.type.annotation.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.return.type.ts"),
+            ("Promise", "meta.class.ts meta.method.declaration.ts meta.return.type.ts entity.name.type.ts", "interface.defaultLibrary"),
+            ("<", "meta.class.ts meta.method.declaration.ts meta.return.type.ts meta.type.parameters.ts punctuation.definition.typeparameters.begin.ts"),
+            ("boolean", "meta.class.ts meta.method.declaration.ts meta.return.type.ts meta.type.parameters.ts support.type.primitive.ts"),
+            (">", "meta.class.ts meta.method.declaration.ts meta.return.type.ts meta.type.parameters.ts punctuation.definition.typeparameters.end.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts"),
+            ("{", "meta.class.ts meta.method.declaration.ts meta.block.ts punctuation.definition.block.ts"),
+        ],
+        [
+            ("    ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            ("const", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts storage.type.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts"),
+            ("text", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts meta.var-single-variable.expr.ts meta.definition.variable.ts variable.other.constant.ts", "variable.declaration.readonly"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts"),
+            ("=", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts keyword.operator.assignment.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts"),
+            ("await", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts keyword.control.flow.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts"),
+            ("readFile", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts meta.function-call.ts entity.name.function.ts", "function"),
+            ("(", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts meta.brace.round.ts"),
+            ("path", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts variable.other.readwrite.ts", "parameter"),
+            (",", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts punctuation.separator.comma.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts"),
+            ('"', "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts string.quoted.double.ts punctuation.definition.string.begin.ts"),
+            ("utf8", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts string.quoted.double.ts"),
+            ('"', "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts string.quoted.double.ts punctuation.definition.string.end.ts"),
+            (")", "meta.class.ts meta.method.declaration.ts meta.block.ts meta.var.expr.ts meta.brace.round.ts"),
+            (";", "meta.class.ts meta.method.declaration.ts meta.block.ts punctuation.terminator.statement.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            ("//", "meta.class.ts meta.method.declaration.ts meta.block.ts comment.line.double-slash.ts punctuation.definition.comment.ts"),
+            (" TODO: stream large files", "meta.class.ts meta.method.declaration.ts meta.block.ts comment.line.double-slash.ts"),
+        ],
+        [
+            ("    ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            ("return", "meta.class.ts meta.method.declaration.ts meta.block.ts keyword.control.flow.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            ("this", "meta.class.ts meta.method.declaration.ts meta.block.ts variable.language.this.ts"),
+            (".", "meta.class.ts meta.method.declaration.ts meta.block.ts punctuation.accessor.ts"),
+            ("cache", "meta.class.ts meta.method.declaration.ts meta.block.ts variable.other.object.property.ts", "property.readonly"),
+            (".", "meta.class.ts meta.method.declaration.ts meta.block.ts punctuation.accessor.ts"),
+            ("size", "meta.class.ts meta.method.declaration.ts meta.block.ts support.variable.property.ts", "property.readonly.defaultLibrary"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            (">", "meta.class.ts meta.method.declaration.ts meta.block.ts keyword.operator.relational.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            ("0", "meta.class.ts meta.method.declaration.ts meta.block.ts constant.numeric.decimal.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            ("&&", "meta.class.ts meta.method.declaration.ts meta.block.ts keyword.operator.logical.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            ("text", "meta.class.ts meta.method.declaration.ts meta.block.ts variable.other.constant.ts", "variable.readonly"),
+            (".", "meta.class.ts meta.method.declaration.ts meta.block.ts punctuation.accessor.ts"),
+            ("length", "meta.class.ts meta.method.declaration.ts meta.block.ts support.variable.property.ts", "property.readonly.defaultLibrary"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            ("!==", "meta.class.ts meta.method.declaration.ts meta.block.ts keyword.operator.comparison.ts"),
+            (" ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            ("0", "meta.class.ts meta.method.declaration.ts meta.block.ts constant.numeric.decimal.ts"),
+            (";", "meta.class.ts meta.method.declaration.ts meta.block.ts punctuation.terminator.statement.ts"),
+        ],
+        [
+            ("  ", "meta.class.ts meta.method.declaration.ts meta.block.ts"),
+            ("}", "meta.class.ts meta.method.declaration.ts meta.block.ts punctuation.definition.block.ts"),
+        ],
+        [
+            ("}", "meta.class.ts punctuation.definition.block.ts"),
+        ],
+    ]),
+}
+
+@lru_cache(maxsize=None)
+def compiled_samples():
+    """PREVIEW_SAMPLES with every token's scopes turned into a full stack tuple once."""
+    return [
+        (filename, language, [
+            [
+                (token[0], (root, *token[1].split()), token[2] if len(token) > 2 else None)
+                for token in line
+            ]
+            for line in lines
+        ])
+        for filename, (language, root, lines) in PREVIEW_SAMPLES.items()
+    ]
+
+def scope_rule_shape(token_colors):
+    """What tokenColors selector resolution depends on: each rule's scope and the settings it sets."""
+    return tuple(
+        (
+            tuple(rule["scope"]) if isinstance(rule.get("scope"), list) else rule.get("scope"),
+            tuple(key for key in ("foreground", "fontStyle") if key in rule.get("settings", {})),
+        )
+        for rule in token_colors
+    )
+
+def scope_matches(selector, scope):
+    return scope == selector or scope.startswith(selector + ".")
+
+@lru_cache(maxsize=64)
+def scope_index(shape):
+    """
+    Index tokenColors selectors by their innermost part, so a scope is matched by looking up its
+    dotted prefixes ("entity", "entity.name", ...) instead of testing every rule. The index and
+    its per-stack memo are shared by every theme with the same shape, i.e. every variant of one
+    template. A rule without a scope sets the defaults; exclusions ("a - b") are not supported.
+    """
+    index = {}
+    defaults = {}
+    for number, (scope, properties) in enumerate(shape):
+        if scope is None:
+            defaults.update((prop, number) for prop in properties)
+            continue
+        for selector in scope.split(",") if isinstance(scope, str) else scope:
+            parts = selector.split(" - ")[0].split()
+            if parts:
+                specificity = (parts[-1].count(".") + 1, len(parts) - 1, number)
+                index.setdefault(parts[-1], []).append((tuple(parts[:-1]), specificity, properties))
+    return {"index": index, "defaults": defaults, "memo": {}}
+
+def ancestors_match(parents, ancestors):
+    """Whether the selector's parent parts match the ancestor scopes in order (not necessarily adjacent)."""
+    position = len(ancestors)
+    for part in reversed(parents):
+        while position:
+            position -= 1
+            if scope_matches(part, ancestors[position]):
+                break
+        else:
+            return False
+    return True
+
+def resolve_scopes(scope_rules, stack):
+    """
+    Map a scope stack to {setting: rule number} the way VS Code themes it: the innermost scope's
+    matching rules override what the enclosing stack resolved to, setting by setting, and among
+    them the longer selector, then more parent parts, then the later rule wins.
+    """
+    memo = scope_rules["memo"]
+    resolved = memo.get(stack)
+    if resolved is not None:
+        return resolved
+    resolved = dict(resolve_scopes(scope_rules, stack[:-1]) if len(stack) > 1 else scope_rules["defaults"])
+    parts, ancestors = stack[-1].split("."), stack[:-1]
+    index = scope_rules["index"]
+    matched = []
+    for end in range(1, len(parts) + 1):
+        for parents, specificity, properties in index.get(".".join(parts[:end]), ()):
+            if ancestors_match(parents, ancestors):
+                matched.append((specificity, properties))
+    for (_, _, number), properties in sorted(matched):
+        resolved.update((prop, number) for prop in properties)
+    memo[stack] = resolved
+    return resolved
+
+def semantic_shape(semantic_colors):
+    return tuple(
+        (selector, ("foreground",) if isinstance(value, str) else tuple(
+            key for key in ("foreground", "fontStyle") + PREVIEW_FONT_STYLES if key in value
+        ))
+        for selector, value in semantic_colors.items()
+    )
+
+@lru_cache(maxsize=64)
+def semantic_index(shape):
+    """Parse semanticTokenColors selectors ("type.modifier...:language", "*" for any type)."""
+    selectors = []
+    for selector, properties in shape:
+        token, _, language = selector.partition(":")
+        token_type, *modifiers = token.split(".")
+        score = (len(modifiers), token_type != "*", bool(language))
+        selectors.append((token_type, frozenset(modifiers), language, score, selector, properties))
+    return {"selectors": selectors, "memo": {}}
+
+def resolve_semantic(semantic_rules, semantic, language):
+    """Map a semantic token ("type.modifier...") to {setting: selector}, most specific selector winning."""
+    key = (semantic, language)
+    resolved = semantic_rules["memo"].get(key)
+    if resolved is None:
+        token_type, *modifiers = semantic.split(".")
+        matched = sorted(
+            (score, selector, properties)
+            for selector_type, selector_modifiers, selector_language, score, selector, properties in semantic_rules["selectors"]
+            if selector_type in ("*", token_type)
+            and selector_modifiers.issubset(modifiers)
+            and selector_language in ("", language)
+        )
+        resolved = {}
+        for _, selector, properties in matched:
+            resolved.update((prop, selector) for prop in properties)
+        semantic_rules["memo"][key] = resolved
+    return resolved
+
+def preview_styler(theme_data):
+    colors = theme_data.get("colors", {})
+    background = composite_over(colors.get("editor.background", "#1e1e1e"), "#000000")
+    token_colors = theme_data.get("tokenColors", [])
+    semantic_colors = theme_data.get("semanticTokenColors", {}) if theme_data.get("semanticHighlighting") else {}
+    return {
+        "background": background,
+        "foreground": colors.get("editor.foreground", "#d4d4d4"),
+        "settings": [rule.get("settings", {}) for rule in token_colors],
+        "scopes": scope_index(scope_rule_shape(token_colors)),
+        "semantic_colors": semantic_colors,
+        "semantic": semantic_index(semantic_shape(semantic_colors)),
+        "styles": {},
+        "composited": {},
+    }
+
+def token_style(styler, stack, semantic=None, language=None):
+    """Return (opaque #rrggbb foreground, font styles) for one token, memoized per scope stack."""
+    key = (stack, semantic, language)
+    style = styler["styles"].get(key)
+    if style is not None:
+        return style
+    foreground = styler["foreground"]
+    font_style = set()
+    settings = styler["settings"]
+    for prop, number in resolve_scopes(styler["scopes"], stack).items():
+        if prop == "foreground":
+            foreground = settings[number]["foreground"]
+        else:
+            font_style = set(settings[number]["fontStyle"].split())
+    if semantic:
+        for prop, selector in resolve_semantic(styler["semantic"], semantic, language).items():
+            value = styler["semantic_colors"][selector]
+            if prop == "foreground":
+                foreground = value if isinstance(value, str) else value["foreground"]
+            elif prop == "fontStyle":
+                font_style = set(value["fontStyle"].split())
+            elif value[prop]:
+                font_style.add(prop)
+            else:
+                font_style.discard(prop)
+    composited = styler["composited"].get(foreground)
+    if composited is None:
+        composited = styler["composited"][foreground] = composite_over(foreground, styler["background"])
+    style = (composited, tuple(name for name in PREVIEW_FONT_STYLES if name in font_style))
+    styler["styles"][key] = style
+    return style
+
+def style_samples(styler):
+    """Style every PREVIEW_SAMPLES token. Returns ([(filename, [[(text, style)]])], token count)."""
+    styled = []
+    count = 0
+    for filename, language, lines in compiled_samples():
+        styled_lines = []
+        for line in lines:
+            styled_lines.append([(text, token_style(styler, stack, semantic, language)) for text, stack, semantic in line])
+            count += len(line)
+        styled.append((filename, styled_lines))
+    return styled, count
+
+@lru_cache(maxsize=None)
+def ansi_style(style):
+    color, font_styles = style
+    codes = ["22", "23", "24", "29", "38;2;{};{};{}".format(*hex_to_rgb(color))]
+    return "\x1b[" + ";".join(codes + [ANSI_FONT_CODES[name] for name in font_styles]) + "m"
+
+def render_preview_ansi(label, styler, styled):
+    background = "\x1b[48;2;{};{};{}m".format(*hex_to_rgb(styler["background"]))
+    plain = ansi_style((composite_over(styler["foreground"], styler["background"]), ()))
+    width = max(sum(len(text) for text, _ in line) for _, lines in styled for line in lines) + 2
+    out = [f"\x1b[1m{label}\x1b[0m\n"]
+    for filename, lines in styled:
+        out.append(f"\n{filename}\n")
+        for line in lines:
+            length = sum(len(text) for text, _ in line)
+            out.append(background + plain + " ")
+            out.extend(ansi_style(style) + text for text, style in line)
+            out.append(plain + " " * (width - length - 1) + "\x1b[0m\n")
+    return "".join(out)
+
+@lru_cache(maxsize=None)
+def html_style(style):
+    color, font_styles = style
+    css = [f"color:{color}"]
+    if "bold" in font_styles:
+        css.append("font-weight:bold")
+    if "italic" in font_styles:
+        css.append("font-style:italic")
+    decorations = [name.replace("strikethrough", "line-through") for name in font_styles if name in ("underline", "strikethrough")]
+    if decorations:
+        css.append("text-decoration:" + " ".join(decorations))
+    return ";".join(css)
+
+def render_preview_html(label, styler, styled):
+    import html
+
+    background = styler["background"]
+    foreground = composite_over(styler["foreground"], background)
+    out = [
+        "<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(label)}</title></head>\n"
+        f"<body style=\"background:{background};color:{foreground};font-family:sans-serif\">\n"
+        f"<h1>{html.escape(label)}</h1>\n"
+    ]
+    for filename, lines in styled:
+        out.append(f"<h2>{html.escape(filename)}</h2>\n<pre style=\"font-family:monospace;padding:1em\">")
+        for line in lines:
+            out.extend(f"<span style=\"{html_style(style)}\">{html.escape(text)}</span>" for text, style in line)
+            out.append("\n")
+        out.append("</pre>\n")
+    out.append("</body>\n</html>\n")
+    return "".join(out)
+
+PREVIEW_RENDERERS = {"ansi": render_preview_ansi, "html": render_preview_html}
+
+def write_previews(preview_format, preview_dir, themes):
+    """
+    Render the samples for every (label, theme file) into preview_dir, one file per theme.
+    Returns (files written, tokens styled, seconds spent styling).
+    """
+    os.makedirs(preview_dir, exist_ok=True)
+    extension = PREVIEW_FORMATS[preview_format]
+    written = 0
+    tokens = 0
+    styling = 0.0
+    for label, path in themes:
+        with open(path, "r") as f:
+            theme_data = json.load(f)
+        started = time.perf_counter()
+        styler = preview_styler(theme_data)
+        styled, count = style_samples(styler)
+        styling += time.perf_counter() - started
+        tokens += count
+        stem = os.path.splitext(os.path.basename(path))[0]
+        content = PREVIEW_RENDERERS[preview_format](label, styler, styled)
+        written += write_if_changed(os.path.join(preview_dir, stem + extension), content)
+    return written, tokens, styling
+
+# ─────────────────────────────────────────────────────────────
+#  WATCH MODE
+# ─────────────────────────────────────────────────────────────
+WATCH_INTERVAL = 0.05
+
+def watch_stamps(paths):
+    """Size/mtime stamps for each watched path (None when missing), including catalog files."""
+    stamps = {}
+    for path in paths:
+        for file_path in [path, *(catalog_files(path) if os.path.isdir(path) else ())]:
+            try:
+                stamps[file_path] = file_stamp(file_path)
+            except OSError:
+                stamps[file_path] = None
+    return stamps
+
+def read_watched_variants(args):
+    return {
+        name: (spec, light_accent)
+        for name, spec, light_accent in select_variants(iter_catalog(args.catalog), args.only, args.match)
+    }
+
+def watch(args, script_dir, source_path):
+    """
+    Poll the template, the catalogs and this script, and patch only what changed.
+
+    The compiled plan, the palette of every spec, each variant's rendered document and
+    validation comparisons (see variant_state) and the color conversion caches stay in
+    memory. A template edit is diffed against the previous template and only the changed
+    paths are re-rendered; a catalog edit patches the paths of the roles whose color
+    changed. An edit to this script restarts the process.
+    """
+    themes_dir = os.path.join(script_dir, "themes")
     template_filename = os.path.basename(source_path)
+    script_path = os.path.abspath(__file__)
+    encoder = output_encoder(args.format, args.sort_keys)
+    palettes = {}
+    plan = None
+    variants = {}
+    states = {}
+    stamps = {}
+
+    print(f"\n👀 Watching {template_filename}{' and catalogs' if args.catalog else ''} (Ctrl+C to stop)...", flush=True)
+    while True:
+        try:
+            time.sleep(args.watch_interval)
+            current = watch_stamps([source_path, script_path, *(args.catalog or ())])
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching.")
+            return
+        if current == stamps:
+            continue
+
+        changed = {path for path in current.keys() | stamps.keys() if current.get(path) != stamps.get(path)}
+        first = not stamps
+        stamps = current
+        if not first and script_path in changed:
+            print("🔁 Generator changed, restarting...")
+            sys.stdout.flush()
+            os.execv(sys.executable, [sys.executable, script_path, *sys.argv[1:]])
+
+        started = time.perf_counter()
+        try:
+            template_paths = []
+            if first or source_path in changed:
+                with open(source_path, "r") as f:
+                    new_plan = compile_template(parse_template(f.read()))
+                if plan is not None:
+                    template_paths = list(diff_paths(plan["skeleton"], new_plan["skeleton"]))
+                plan = new_plan
+            new_variants = variants
+            if first or changed - {source_path, script_path}:
+                new_variants = read_watched_variants(args)
+                plan_outputs(new_variants, modes=args.modes)
+        except (OSError, ValueError) as error:
+            print(f"  ✗ {error}")
+            continue
+
+        if new_variants.keys() != variants.keys():
+            update_package_json(
+                script_dir,
+                [theme_contribution(name, mode) for name in new_variants for mode in args.modes],
+            )
+            for name in variants.keys() - new_variants.keys():
+                for mode in args.modes:
+                    states.pop(output_name(name, mode), None)
+
+        rebuilt, written, patched, compared = 0, 0, 0, 0
+        for (name, (spec, light_accent)), mode in itertools.product(new_variants.items(), args.modes):
+            output = output_name(name, mode)
+            state = states.pop(output, None)
+            if state is not None and not template_paths and variants.get(name) == (spec, light_accent):
+                states[output] = state
+                continue
+            theme_label = f"{DISPLAY_NAME} {output}"
+            filepath = os.path.join(themes_dir, theme_filename(name, mode))
+            try:
+                palette_key = (json.dumps(spec, sort_keys=True), mode)
+                if palette_key not in palettes:
+                    dark_key = (palette_key[0], "dark")
+                    if dark_key not in palettes:
+                        palettes[dark_key] = build_role_palette(spec)
+                    palettes[palette_key] = mode_palette(palettes[dark_key], mode)
+                if state is None:
+                    state = variant_state(plan, theme_label, palettes[palette_key], light_accent, mode)
+                else:
+                    state = patch_variant_state(state, plan, template_paths, palettes[palette_key], light_accent)
+                    patched += 1
+                check_validation(theme_label, state["comparison"], mode)
+            except ValueError as error:
+                # Dropping the state makes the next change render this variant from scratch.
+                print(f"  ✗ {theme_label}")
+                for line in str(error).splitlines():
+                    print(f"     {line}")
+                continue
+            states[output] = state
+            compared += state["compared"]
+            sha256, size = stream_json(state["theme"], staged_path(filepath), encoder)
+            written += commit_staged_output(filepath, sha256, size)
+            rebuilt += 1
+        variants = new_variants
+
+        elapsed = (time.perf_counter() - started) * 1000
+        if not first:
+            print(
+                f"  ✏️  Rebuilt {rebuilt} variant(s) ({patched} patched, {len(template_paths)} template path(s), "
+                f"{compared} check(s)), wrote {written}, in {elapsed:.1f} ms",
+                flush=True,
+            )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=f"Generate the {DISPLAY_NAME} theme variants.")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes (0 = one per CPU, default 1)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"ignore {CACHE_DIRNAME}/ (build manifest and compiled state) and rebuild every variant",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help=f"rebuild every variant, print per-stage and solver details and write them as JSON "
+        f"(default {CACHE_DIRNAME}/profile.json)",
+    )
+    parser.add_argument(
+        "--template",
+        action="append",
+        metavar="PATH",
+        help="build every spec with this template (repeatable); outputs of "
+        f"{TEMPLATE_STEM}-NAME.json are suffixed -NAME (default themes/{TEMPLATE_STEM}.json)",
+    )
+    parser.add_argument(
+        "--catalog",
+        action="append",
+        metavar="PATH",
+        help="read variant specs from a .json/.jsonl/.toml catalog or a directory of them "
+        "instead of THEME_SPECS (repeatable)",
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        metavar="NAME",
+        help="build only this variant (repeatable, case-insensitive)",
+    )
+    parser.add_argument(
+        "--match",
+        action="append",
+        metavar="PATTERN",
+        help="build only variants whose name matches this glob, e.g. 'b*' (repeatable)",
+    )
+    parser.add_argument(
+        "--modes",
+        type=parse_modes,
+        default=["dark"],
+        metavar="MODES",
+        help=f"comma-separated modes to render for each spec: {', '.join(MODES)} (default dark)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=tuple(OUTPUT_FORMATS),
+        default="pretty",
+        help="theme file layout: indented (default) or compact for the smallest VSIX",
+    )
+    parser.add_argument(
+        "--sort-keys",
+        action="store_true",
+        help="write theme keys in sorted order for canonical, diff-stable output",
+    )
+    parser.add_argument(
+        "--audit",
+        nargs="?",
+        const="collect",
+        choices=AUDIT_MODES,
+        help=f"rebuild every variant and contrast-check every foreground against its composited "
+        f"background; 'collect' (default) reports all violations to {CACHE_DIRNAME}/audit.json, "
+        f"'fail-fast' fails a variant on its first violation",
+    )
+    parser.add_argument(
+        "--distinct",
+        nargs="?",
+        const=DISTINCT_DELTA,
+        type=float,
+        metavar="DELTA",
+        help=f"report syntax foregrounds closer than DELTA in OKLab (default {DISTINCT_DELTA}) to "
+        f"{CACHE_DIRNAME}/distinct.json and exit 1 if any; with --explore, drop such candidates",
+    )
+    parser.add_argument(
+        "--cvd",
+        choices=CVD_MODES,
+        default="warn",
+        help="re-check text contrast and syntax color distinctness under protan, deutan and tritan "
+        f"simulation and report to {CACHE_DIRNAME}/cvd.json; 'strict' exits 1 on findings (default warn)",
+    )
+    parser.add_argument(
+        "--preview",
+        choices=tuple(PREVIEW_FORMATS),
+        help=f"also render sample Python and TypeScript with each theme to "
+        f"{CACHE_DIRNAME}/preview/ as ANSI (view with cat) or HTML",
+    )
+    parser.add_argument(
+        "--preview-output",
+        metavar="DIR",
+        help=f"directory for --preview files (default {CACHE_DIRNAME}/preview)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="verify the theme files and package.json are up to date without writing anything; "
+        "exits 1 with a per-variant report otherwise",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="after generating, keep running and rebuild when the template or catalogs change",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=WATCH_INTERVAL,
+        metavar="SECONDS",
+        help=f"polling interval for --watch (default {WATCH_INTERVAL})",
+    )
+    parser.add_argument(
+        "--explore",
+        choices=("random", "grid"),
+        help="sweep candidate surface seeds and accents instead of building THEME_SPECS",
+    )
+    parser.add_argument(
+        "--explore-count",
+        type=int,
+        default=100000,
+        help="number of random candidates (default 100000)",
+    )
+    parser.add_argument(
+        "--explore-grid",
+        default="36,10,1",
+        metavar="H,S,L",
+        help="hue, saturation and lightness steps for grid exploration (default 36,10,1)",
+    )
+    parser.add_argument("--explore-seed", type=int, default=0, help="random seed for exploration")
+    parser.add_argument("--explore-top", type=int, default=20, help="size of the ranked catalog")
+    parser.add_argument(
+        "--explore-output",
+        metavar="PATH",
+        help=f"JSON lines file for survivors (default {CACHE_DIRNAME}/explore.jsonl)",
+    )
+    parser.add_argument(
+        "--build-surface-lut",
+        action="store_true",
+        help=f"solve surfaces for a dense hue x saturation grid of seeds on --jobs processes and "
+        f"store them in {CACHE_DIRNAME}/surface-lut.bin for --explore to look up, then exit "
+        "(or explore, with --explore)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="PATH",
+        help="dump cProfile stats for the whole run (main process only) to PATH",
+    )
+    args = parser.parse_args(argv)
+    if args.distinct is not None and args.distinct <= 0:
+        parser.error("--distinct needs a positive delta")
+    if args.watch and args.template:
+        parser.error("--watch follows the default template only; drop --template")
+    if args.check and (args.watch or args.explore or args.profile is not None or args.build_surface_lut):
+        parser.error("--check cannot be combined with --watch, --explore, --profile or --build-surface-lut")
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+STARTUP_CPU_MS = 0.0
+
+def main(argv=None):
+    global STARTUP_CPU_MS
+    STARTUP_CPU_MS = time.process_time() * 1000
+    args = parse_args(argv)
+    if not args.cprofile:
+        try:
+            generate(args)
+        except SystemExit:
+            # A failing variant should not stop an authoring session from starting.
+            if not args.watch:
+                raise
+        if args.watch and not args.explore:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            watch(args, script_dir, os.path.join(script_dir, "themes", TEMPLATE_STEM + ".json"))
+        return
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(generate, args)
+    finally:
+        profiler.dump_stats(args.cprofile)
+        print(f"\n🔬 Wrote cProfile stats to {args.cprofile}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+def check_outputs(
+    args, script_dir, template_bytes, variants, outputs, filenames, stale, output_options, state, manifest
+):
+    """
+    --check: verify every output without touching the filesystem. Outputs the cache vouches
+    for are not rendered at all; the rest are rendered in memory and compared by hash, with a
+    structural diff on mismatch. Exits 1 with a per-variant report when anything is out of date.
+    """
+    started = time.perf_counter()
+    themes_dir = os.path.join(script_dir, "themes")
+    results = []
+    if stale:
+        plans, _ = compile_templates(template_bytes, stale, state)
+        variant_jobs = variant_jobs_for(variants, stale, state)
+        options = {"output": output_options, "audit": args.audit, "check": True}
+        results = build_variants(plans, variant_jobs, args.jobs, options)
+
+    problems = {}
+    for result in results:
+        if result["error"]:
+            problems[filenames[result["name"]]] = "fails validation: " + result["error"].splitlines()[0]
+        elif result["check"]:
+            problems[filenames[result["name"]]] = result["check"]
+        elif result["audit"]:
+            problems[filenames[result["name"]]] = f"{len(result['audit'])} contrast audit violation(s)"
+
+    for old_dir in ["dark", "light"]:
+        if os.path.isdir(os.path.join(script_dir, old_dir)):
+            problems[f"{old_dir}/"] = "obsolete directory"
+    if not (args.only or args.match) and os.path.isdir(themes_dir):
+        for f in stale_generated_files(themes_dir, filenames, manifest, catalog_source(args.catalog)):
+            problems[f] = "stale generated file"
+
+    generated_themes = [theme_contribution(*output) for output in outputs.values()]
+    pkg = package_json_content(script_dir, generated_themes)
+    pkg_problem = check_content(pkg, os.path.join(script_dir, "package.json"))
+    if pkg_problem:
+        problems["package.json"] = pkg_problem
+
+    elapsed = (time.perf_counter() - started) * 1000
+    for output in outputs:
+        problem = problems.get(filenames[output])
+        print(f"  {'✗' if problem else '✓'} {DISPLAY_NAME} {output}{f': {problem}' if problem else ''}")
+    for filename, problem in problems.items():
+        if filename not in set(filenames.values()):
+            print(f"  ✗ {filename}: {problem}")
+    print(
+        f"\n   {len(outputs)} theme files: {len(outputs) - len(results)} verified from cache, "
+        f"{len(results)} rendered in memory ({elapsed:.0f} ms)"
+    )
+    if problems:
+        print(f"\n❌ {len(problems)} output(s) out of date; run generate_themes.py to update them.")
+        sys.exit(1)
+    print("\n✅ All outputs are up to date.")
+
+def template_paths(args, script_dir):
+    """{template key: path} for --template (default themes/color-sea-template.json), in order."""
+    templates = {}
+    for path in args.template or [os.path.join(script_dir, "themes", TEMPLATE_STEM + ".json")]:
+        key = template_key(path)
+        if key in templates:
+            raise ValueError(f"{path} and {templates[key]} would both write {key or 'default'} outputs")
+        templates[key] = os.path.abspath(path)
+    return templates
+
+def compile_templates(template_bytes, stale, state):
+    """
+    Compile, once each, the templates that have stale outputs, reusing plans persisted in the
+    compiled state. Returns ({template key: plan}, number reused).
+    """
+    needed = {template for jobs in stale.values() for template, _ in jobs}
+    plans = {}
+    reused = 0
+    for template, source in template_bytes.items():
+        if template not in needed:
+            continue
+        key = hash_parts(source)
+        if key in state["plans"]:
+            reused += 1
+        else:
+            state["plans"][key] = compile_template(parse_template(source.decode("utf-8")))
+        plans[template] = state["plans"][key]
+    return plans, reused
+
+def variant_jobs_for(variants, stale, state, reuse_palettes=True):
+    """
+    One build job per spec with stale outputs, carrying any palettes the compiled state has
+    unless reuse_palettes is False (--no-cache, and --profile, which has to time the solvers).
+    """
+    jobs = []
+    for name, outputs in stale.items():
+        spec, light_accent = variants[name]
+        known = {}
+        for mode in {"dark", *(mode for _, mode in outputs)} if reuse_palettes else ():
+            palette = state["palettes"].get(palette_state_key(spec, mode))
+            if palette is not None:
+                known[mode] = palette
+        jobs.append((name, spec, light_accent, outputs, known))
+    return jobs
+
+def remember_palettes(state, variants, outputs, results):
+    """Add the palettes workers derived to the compiled state, keeping it bounded."""
+    palettes = state["palettes"]
+    for result in results:
+        if result.get("palette") is not None:
+            name, mode, _ = outputs[result["name"]]
+            palettes[palette_state_key(variants[name][0], mode)] = result["palette"]
+    for key in list(palettes)[:max(0, len(palettes) - STATE_PALETTE_LIMIT)]:
+        del palettes[key]
+
+def generate(args):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        templates = template_paths(args, script_dir)
+    except ValueError as error:
+        print(f"❌ {error}")
+        sys.exit(1)
+
+    if args.build_surface_lut:
+        lut_path = surface_lut_path(script_dir)
+        hue_count, saturation_count = SURFACE_LUT_SHAPE
+        print(f"🗺️  Solving {hue_count}x{saturation_count} surface seeds on {args.jobs} process(es)...")
+        started = time.perf_counter()
+        cells, unsolvable = build_surface_lut(lut_path, args.jobs)
+        print(
+            f"   {cells} cells ({unsolvable} unsolvable) in {time.perf_counter() - started:.1f}s, "
+            f"{format_size(os.path.getsize(lut_path))} written to {lut_path}"
+        )
+        if not args.explore:
+            return
+
+    if args.explore:
+        return explore(args, script_dir, next(iter(templates.values())))
     
     # 1. READ SOURCE (but do not edit specific file)
-    print(f"📖 Reading source template: {source_path}")
-    with open(source_path, "r") as f:
-        source_str = f.read()
+    template_bytes = {}
+    for template, source_path in templates.items():
+        print(f"📖 Reading source template: {source_path}")
+        with open(source_path, "rb") as f:
+            template_bytes[template] = f.read()
 
     themes_dir = os.path.join(script_dir, "themes")
-    os.makedirs(themes_dir, exist_ok=True)
+    if not args.check:
+        os.makedirs(themes_dir, exist_ok=True)
+
+    # 2. GENERATE THEMES (only variants whose inputs or outputs changed)
+    print(f"\n{'🔍 Checking' if args.check else '🎨 Generating'} {DISPLAY_NAME} themes...")
+    cache_path = os.path.join(script_dir, CACHE_DIRNAME, "manifest.json")
+    stored_cache = load_build_cache(cache_path)
+    cache = {} if args.no_cache or args.profile is not None or args.audit else stored_cache
+    output_options = {"output_format": args.format, "sort_keys": args.sort_keys}
+    fingerprints = {
+        template: generator_fingerprint(source, output_options) for template, source in template_bytes.items()
+    }
 
-    # 2. CLEAN UP OLD FILES (dark/, light/, and generated theme files)
+    # Catalog entries stream through the selection filter; only selected specs are kept.
+    selecting = bool(args.only or args.match)
+    source = catalog_source(args.catalog)
+    try:
+        variants = {
+            name: (spec, light_accent)
+            for name, spec, light_accent in select_variants(iter_catalog(args.catalog), args.only, args.match)
+        }
+    except (OSError, ValueError) as error:
+        print(f"❌ Could not read catalog: {error}")
+        sys.exit(1)
+    unknown = sorted({name.lower() for name in args.only or ()} - {name.lower() for name in variants})
+    if unknown or not variants:
+        print(f"❌ No variant named {', '.join(unknown)}" if unknown else "❌ No variants selected.")
+        sys.exit(1)
+
+    # Every spec is rendered with each template in each requested mode; outputs are keyed by
+    # their display name.
+    try:
+        outputs, filenames = plan_outputs(variants, templates, args.modes)
+    except ValueError as error:
+        print(f"❌ {error}")
+        sys.exit(1)
+    keys = {
+        output: variant_cache_key(fingerprints[template], name, *variants[name], mode)
+        for output, (name, mode, template) in outputs.items()
+    }
+    stale = {}
+    for output, (name, mode, template) in outputs.items():
+        filepath = os.path.join(themes_dir, filenames[output])
+        if not cached_output_current(cache.get(output), keys[output], filepath):
+            stale.setdefault(name, {})[(template, mode)] = filepath
+
+    # Compiled plans and solved palettes persist across runs; the state is only read if needed,
+    # and --no-cache starts from an empty one (saved afterwards, like the manifest).
+    state_path = os.path.join(script_dir, CACHE_DIRNAME, "state.pickle")
+    state = None
+    state_ms = 0.0
+    if stale:
+        started = time.perf_counter()
+        state = load_compiled_state(None if args.no_cache else state_path, script_digest())
+        state_ms = (time.perf_counter() - started) * 1000
+
+    if args.check:
+        return check_outputs(
+            args, script_dir, template_bytes, variants, outputs, filenames, stale, output_options, state, stored_cache
+        )
+
+    results = []
+    plans_reused = palettes_reused = 0
+    if stale:
+        plans, plans_reused = compile_templates(template_bytes, stale, state)
+        reuse_palettes = not args.no_cache and args.profile is None
+        variant_jobs = variant_jobs_for(variants, stale, state, reuse_palettes)
+        palettes_reused = sum(len(job[4]) for job in variant_jobs)
+        options = {
+            "profile": args.profile is not None,
+            "output": output_options,
+            "audit": args.audit,
+            "cvd": args.cvd != "off",
+        }
+        results = build_variants(plans, variant_jobs, args.jobs, options)
+    failures = [result for result in results if result["error"]]
+    if failures:
+        discard_staged_outputs(results)
+        for result in failures:
+            print(f"  ✗ {result['label']}")
+            for line in result["error"].splitlines():
+                print(f"     {line}")
+        print(f"\n❌ {len(failures)} of {len(results)} themes failed validation; no files were written.")
+        sys.exit(1)
+
+    # 3. CLEAN UP OLD FILES (dark/, light/, and stale generated theme files)
     for old_dir in ["dark", "light"]:
         odir = os.path.join(script_dir, old_dir)
         if os.path.isdir(odir):
@@ -550,69 +3928,157 @@ def main():
             shutil.rmtree(odir)
             print(f"🗑️  Removed {old_dir}/ directory")
 
-    # Remove generated files in themes/ to avoid duplicates, but keep the template source.
-    for f in os.listdir(themes_dir):
-        if f == template_filename:
-            continue
-        if f.startswith("color-sea-") and f.endswith(".json"):
-            os.remove(os.path.join(themes_dir, f))
+    # Remove generated files that no longer belong to a variant; a partial (--only/--match)
+    # run leaves the other variants' files alone.
+    for f in [] if selecting else stale_generated_files(themes_dir, filenames, stored_cache, source):
+        os.remove(os.path.join(themes_dir, f))
+        print(f"🗑️  Removed stale {f}")
 
-    # 3. GENERATE THEMES
-    print(f"\n🎨 Generating {DISPLAY_NAME} themes...")
+    built = {result["name"]: result for result in results}
+    variants_cache = {
+        name: entry for name, entry in stored_cache.items() if selecting or entry.get("catalog") != source
+    }
     generated_themes = []
+    total_size = 0
 
-    for color_name, spec in THEME_SPECS.items():
-        theme_label = f"{DISPLAY_NAME} {color_name}"
-        filename    = f"color-sea-{color_name.lower()}.json"
+    for name, (variant, mode, template) in outputs.items():
+        theme_label = f"{DISPLAY_NAME} {name}"
+        filename    = filenames[name]
         filepath    = os.path.join(themes_dir, filename)
-        light_accent = LIGHT_ACCENT_COLORS.get(color_name)
 
-        print(f"  → {theme_label}")
-        theme_json, metrics = generate_theme(source_str, theme_label, spec, light_accent)
-        
-        with open(filepath, "w") as f:
-            f.write(theme_json)
+        if name in built:
+            result = built[name]
+            written = commit_staged_output(filepath, result["sha256"], result["size"])
+            metrics = result["metrics"]
+            status = "" if written else " (unchanged)"
+            variants_cache[name] = {
+                "key": keys[name],
+                "sha256": result["sha256"],
+                "stamp": file_stamp(filepath),
+                "metrics": metrics,
+                "catalog": source,
+                "file": filename,
+            }
+        else:
+            variants_cache[name] = {**cache[name], "catalog": source, "file": filename}
+            metrics = cache[name]["metrics"]
+            status = " (cached)"
 
+        size = variants_cache[name]["stamp"][0]
+        total_size += size
+        print(f"  → {theme_label}{status}")
         print(
             "     "
             f"surface={metrics['surface_ratio']:.3f} "
             f"selection={metrics['selection_ratio']:.3f} "
             f"editor-fg={metrics['editor_fg_ratio']:.3f} "
-            f"info={metrics['info_ratio']:.3f}"
+            f"info={metrics['info_ratio']:.3f} "
+            f"size={format_size(size)}"
         )
         
-        generated_themes.append({
-            "label": theme_label,
-            "uiTheme": "vs-dark",
-            "path": f"./themes/{filename}"
-        })
-
-    # 4. UPDATE PACKAGE.JSON
-    pkg_path = os.path.join(script_dir, "package.json")
-    with open(pkg_path, "r") as f:
-        pkg = json.load(f)
-
-    # Update metadata
-    pkg["name"] = EXTENSION_NAME
-    pkg["displayName"] = DISPLAY_NAME
-    pkg["publisher"] = PUBLISHER_NAME
-    pkg["description"] = "A collection of vibrant, deep dark themes for VS Code."
-    pkg["repository"]["url"] = REPO_URL
-    pkg["homepage"] = f"{REPO_URL}/blob/main/README.md"
-    pkg["bugs"]["url"] = f"{REPO_URL}/issues"
+        generated_themes.append(theme_contribution(variant, mode, template))
+
+    print(f"\n📏 {len(generated_themes)} theme files, {format_size(total_size)} total ({args.format})")
+
+    if args.profile is not None:
+        print_profile_table(results)
+        profile_path = args.profile or os.path.join(script_dir, CACHE_DIRNAME, "profile.json")
+        os.makedirs(os.path.dirname(profile_path), exist_ok=True)
+        with open(profile_path, "w") as f:
+            json.dump({result["name"]: result["profile"] for result in results}, f, indent=2)
+            f.write("\n")
+        print(f"   Wrote {profile_path}")
+
+    violation_count = 0
+    if args.audit:
+        violation_count = print_audit_report(results, args.audit, os.path.join(script_dir, CACHE_DIRNAME, "audit.json"))
+
+    # Color vision findings are kept in the cache entry, so only rebuilt outputs are simulated.
+    cvd_count = 0
+    if args.cvd != "off":
+        cvd_delta = args.distinct or DISTINCT_DELTA
+        pending = {}
+        for name in outputs:
+            stored = variants_cache[name].get("cvd")
+            if stored is None or stored["delta"] != cvd_delta:
+                if name in built:
+                    pending[name] = built[name]["cvd"]
+                else:
+                    with open(os.path.join(themes_dir, filenames[name]), "r") as f:
+                        pending[name] = cvd_colors(json.load(f), outputs[name][1])
+        for name, report in cvd_reports(pending, cvd_delta).items():
+            variants_cache[name]["cvd"] = {"delta": cvd_delta, "report": report}
+        cvd_count = print_cvd_report(
+            {name: variants_cache[name]["cvd"]["report"] for name in outputs},
+            cvd_delta,
+            os.path.join(script_dir, CACHE_DIRNAME, "cvd.json"),
+        )
 
-    # Only include generated themes (the template source is excluded)
-    pkg["contributes"]["themes"] = generated_themes
+    if stale:
+        state["plans"] = {
+            key: plan for key, plan in state["plans"].items()
+            if key in {hash_parts(source) for source in template_bytes.values()}
+        }
+        remember_palettes(state, variants, outputs, results)
+        save_compiled_state(state_path, state)
 
-    with open(pkg_path, "w") as f:
-        json.dump(pkg, f, indent=2)
-        f.write("\n")
+    # 4. UPDATE PACKAGE.JSON
+    pkg, pkg_updated = update_package_json(script_dir, generated_themes)
+    save_build_cache(cache_path, variants_cache)
 
-    print(f"\n📦 Updated package.json:")
+    print(f"\n📦 {'Updated' if pkg_updated else 'Unchanged'} package.json:")
     print(f"   Name: {pkg['name']}")
     print(f"   Display Name: {pkg['displayName']}")
     print(f"   Publisher: {pkg['publisher']}")
-    print(f"   Themes: {len(generated_themes)}")
+    print(f"   Themes: {len(pkg['contributes']['themes'])}")
+
+    if args.preview:
+        preview_dir = args.preview_output or os.path.join(script_dir, CACHE_DIRNAME, "preview")
+        written, tokens, styling = write_previews(
+            args.preview,
+            preview_dir,
+            [(f"{DISPLAY_NAME} {name}", os.path.join(themes_dir, filenames[name])) for name in outputs],
+        )
+        print(
+            f"\n🖼️  Previewed {len(outputs)} theme(s) to {preview_dir} ({written} updated, "
+            f"{tokens} tokens styled at {tokens / max(styling, 1e-9):,.0f} tokens/s)"
+        )
+
+    collision_count = 0
+    if args.distinct:
+        collisions = {}
+        for name in outputs:
+            with open(os.path.join(themes_dir, filenames[name]), "r") as f:
+                collisions[name] = color_collisions(json.load(f), args.distinct)
+        collision_count = print_collision_report(
+            collisions, args.distinct, os.path.join(script_dir, CACHE_DIRNAME, "distinct.json")
+        )
+
+    print(f"\n⏱️  Startup: {STARTUP_CPU_MS:.0f} ms CPU before main (interpreter and imports)", end="")
+    if stale:
+        print(
+            "; compiled state not read (--no-cache)" if args.no_cache else
+            f"; compiled state loaded in {state_ms:.1f} ms, "
+            f"{plans_reused} plan(s) and {palettes_reused} palette(s) reused"
+        )
+    else:
+        print("; every output cached, nothing compiled")
+
+    cache_stats = color_cache_stats()
+    if any(stats["hits"] or stats["misses"] for stats in cache_stats.values()):
+        print("\n🧮 Color conversion cache (this process):")
+        for name, stats in cache_stats.items():
+            print(f"   {name}: {stats['hits']} hits / {stats['misses']} misses")
+
+    if violation_count:
+        print(f"\n❌ Contrast audit found {violation_count} violation(s).")
+        sys.exit(1)
+    if collision_count:
+        print(f"\n❌ Found {collision_count} pair(s) of near-identical syntax colors.")
+        sys.exit(1)
+    if cvd_count and args.cvd == "strict":
+        print(f"\n❌ Color vision simulation found {cvd_count} issue(s).")
+        sys.exit(1)
 
     print("\n🎉 Generation complete! Ready to package.")
 
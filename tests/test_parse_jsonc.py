@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_themes as gen
+
+TEMPLATE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(gen.__file__)), "themes", gen.TEMPLATE_STEM + ".json"
+)
+
+class ParseJsoncTest(unittest.TestCase):
+    def test_comments_and_trailing_commas(self):
+        text = '{\n  "a": 1, // one\n  /* block,\n  ] */ "b": [1, 2, /* two */ ],\n  "c": {"d": true,},\n}\n'
+        self.assertEqual(gen.parse_jsonc(text), {"a": 1, "b": [1, 2], "c": {"d": True}})
+
+    def test_markers_inside_strings_survive(self):
+        text = '{"url": "https://example.com//x", "glob": "a/*b*/c", "comma": "x,]", "quote": "\\"//"}'
+        self.assertEqual(
+            gen.parse_jsonc(text),
+            {"url": "https://example.com//x", "glob": "a/*b*/c", "comma": "x,]", "quote": '"//'},
+        )
+
+    def test_misplaced_commas_are_rejected_with_position(self):
+        for text in ("[,]", "[1,,2]", "{,}", '{\n  "a": 1\n  "b": 2\n}'):
+            with self.subTest(text=text), self.assertRaisesRegex(ValueError, r"at line \d+ \(offset \d+\)"):
+                gen.parse_jsonc(text)
+
+    def test_fast_path_matches_tokenizing_parser(self):
+        with open(TEMPLATE_PATH, "r") as f:
+            source = f.read()
+        data, _ = gen.parse_jsonc(source, keep_comments=True)
+        self.assertEqual(gen.parse_jsonc(source), data)
+
+    def test_comments_round_trip(self):
+        text = '// header\n{\n  // first\n  "a": [\n    1,\n    // before close\n  ],\n  "b": 2\n}\n'
+        data, comments = gen.parse_jsonc(text, keep_comments=True)
+        self.assertEqual(
+            [(comment["text"], comment["path"]) for comment in comments],
+            [("// header", ()), ("// first", ("a",)), ("// before close", ("a", None))],
+        )
+        dumped = gen.dump_jsonc(data, comments)
+        self.assertEqual(dumped, '// header\n{\n  // first\n  "a": [\n    1\n    // before close\n  ],\n  "b": 2\n}\n')
+        reparsed, recomments = gen.parse_jsonc(dumped, keep_comments=True)
+        self.assertEqual(reparsed, data)
+        self.assertEqual(
+            [(comment["text"], comment["path"]) for comment in recomments],
+            [(comment["text"], comment["path"]) for comment in comments],
+        )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import copy
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_themes as gen
+
+TEMPLATE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(gen.__file__)), "themes", gen.TEMPLATE_STEM + ".json"
+)
+
+def compile_source(source):
+    return gen.compile_template(gen.parse_template(source))
+
+class RenderTemplateTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(TEMPLATE_PATH, "r") as f:
+            cls.source = f.read()
+        cls.palettes = [gen.build_role_palette(spec) for spec in gen.THEME_SPECS.values()]
+
+    def fill_naively(self, plan, palette):
+        theme_data = copy.deepcopy(plan["skeleton"])
+        for path, role, alpha in plan["slots"]:
+            parent = theme_data
+            for key in path[:-1]:
+                parent = parent[key]
+            parent[path[-1]] = palette[role].lower() + alpha
+        return theme_data
+
+    def test_render_fills_every_slot(self):
+        plan = compile_source(self.source)
+        for palette in self.palettes:
+            self.assertEqual(gen.render_template(plan, palette), self.fill_naively(plan, palette))
+
+    def test_slot_free_subtrees_are_shared_and_never_written(self):
+        plan = compile_source(self.source)
+        pristine = copy.deepcopy(plan["skeleton"])
+        first = gen.render_theme(plan, "First", self.palettes[0], "#ffffff")
+        second = gen.render_theme(plan, "Second", self.palettes[1])
+        self.assertIsNot(first["colors"], plan["skeleton"]["colors"])
+        shared = [
+            index for index, rule in enumerate(plan["skeleton"]["tokenColors"])
+            if first["tokenColors"][index]["scope"] is rule["scope"]
+        ]
+        self.assertTrue(shared)
+        self.assertEqual(first["colors"]["editor.findMatchBorder"], "#ffffff")
+        self.assertNotEqual(second["colors"]["editor.findMatchBorder"], "#ffffff")
+        self.assertEqual(plan["skeleton"], pristine)
+
+    def test_patched_variants_match_a_fresh_render(self):
+        plan = compile_source(self.source)
+        old_skeleton = copy.deepcopy(plan["skeleton"])
+        edited = gen.parse_template(self.source)
+        # A scope list holds no slot, so rendered themes share it with the old skeleton.
+        scoped = next(rule for rule in edited["tokenColors"] if isinstance(rule.get("scope"), list) and rule["scope"])
+        scoped["scope"][0] = "markup.edited"
+        edited["tokenColors"][0]["scope"] = ["comment", "punctuation.definition.comment"]
+        edited["tokenColors"][1]["settings"]["fontStyle"] = "italic"
+        edited["colors"]["editor.background"] = "#123456"
+        new_plan = gen.compile_template(edited)
+        paths = list(gen.diff_paths(plan["skeleton"], new_plan["skeleton"]))
+
+        states = [gen.variant_state(plan, f"Variant {index}", palette) for index, palette in enumerate(self.palettes)]
+        bystander = gen.render_theme(plan, "Bystander", self.palettes[0])
+        for index, state in enumerate(states):
+            gen.patch_variant_state(state, new_plan, paths, self.palettes[index])
+            self.assertEqual(state["theme"], gen.render_theme(new_plan, f"Variant {index}", self.palettes[index]))
+        self.assertEqual(plan["skeleton"], old_skeleton)
+        self.assertEqual(bystander, gen.render_theme(plan, "Bystander", self.palettes[0]))
+
+if __name__ == "__main__":
+    unittest.main()
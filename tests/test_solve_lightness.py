@@ -0,0 +1,106 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_themes as gen
+
+def random_hex(rng):
+    return f"#{rng.randrange(0x1000000):06x}"
+
+def stepped_lift(color_hex, background_hex, minimum_ratio):
+    """The loop lift_until_contrast replaced: whole lightness steps while below 96 (so up to 97)."""
+    hue, saturation, lightness = gen.hex_to_hsl(color_hex)
+    while gen.contrast_ratio(color_hex, background_hex) < minimum_ratio and lightness < 96:
+        lightness += 1
+        color_hex = gen.hsl_to_hex(hue, saturation, lightness)
+    return color_hex, lightness
+
+def stepped_tune(color_hex, anchor_hex, minimum_ratio, maximum_ratio):
+    """
+    The loop tune_surface_contrast replaced: quarter steps toward the band, at most 200. It could
+    step below lightness 0, which hsl_to_hex cannot format; here that stops without reaching it.
+    """
+    hue, saturation, lightness = gen.hex_to_hsl(color_hex)
+    for _ in range(200):
+        ratio = gen.contrast_ratio(color_hex, anchor_hex)
+        if minimum_ratio <= ratio <= maximum_ratio:
+            break
+        if ratio < minimum_ratio and lightness < 96:
+            lightness += 0.25
+        elif ratio > maximum_ratio and lightness >= 0.25:
+            lightness -= 0.25
+        else:
+            break
+        color_hex = gen.hsl_to_hex(hue, saturation, lightness)
+    return color_hex, lightness
+
+class SolveLightnessTest(unittest.TestCase):
+    def test_solutions_land_inside_the_ratio_range(self):
+        rng = random.Random(2)
+        bands = [(4.5, gen.math.inf), (1.06, 1.11), (1.70, 1.90), (1.2, 1.21)]
+        for _ in range(300):
+            color, anchor = random_hex(rng), random_hex(rng)
+            minimum_ratio, maximum_ratio = rng.choice(bands)
+            solution = gen.solve_lightness_for_contrast(color, anchor, minimum_ratio, maximum_ratio)
+            if not solution["reached"]:
+                continue
+            with self.subTest(color=color, anchor=anchor, band=(minimum_ratio, maximum_ratio)):
+                self.assertLessEqual(minimum_ratio, gen.contrast_ratio(solution["color"], anchor))
+                self.assertLessEqual(gen.contrast_ratio(solution["color"], anchor), maximum_ratio)
+                self.assertAlmostEqual(solution["ratio"], gen.contrast_ratio(solution["color"], anchor))
+
+    def test_start_inside_the_range_is_kept(self):
+        solution = gen.solve_lightness_for_contrast("#ffffff", "#000000", 4.5)
+        self.assertEqual((solution["color"], solution["exit"]), ("#ffffff", "in_range"))
+
+    def test_unreachable_targets_raise(self):
+        with self.assertRaisesRegex(ValueError, "cannot reach contrast"):
+            gen.lift_until_contrast("#d0d0d0", "#ffffff", 4.5)
+        with self.assertRaisesRegex(ValueError, "cannot reach contrast"):
+            gen.tune_surface_contrast("#808080", "#808080", 30.0, 40.0)
+
+    def test_never_farther_from_the_start_than_the_stepped_loops(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            color, anchor = random_hex(rng), random_hex(rng)
+            start = gen.hex_to_hsl(color)[2]
+            with self.subTest(color=color, anchor=anchor):
+                stepped_color, stepped_lightness = stepped_lift(color, anchor, 4.5)
+                reached = gen.contrast_ratio(stepped_color, anchor) >= 4.5
+                if reached and stepped_lightness <= gen.LIGHTNESS_SEARCH_RANGE[1]:
+                    solution = gen.solve_lightness_for_contrast(
+                        color, anchor, 4.5, lightness_range=(start, gen.LIGHTNESS_SEARCH_RANGE[1])
+                    )
+                    self.assertTrue(solution["reached"])
+                    self.assertLessEqual(abs(solution["lightness"] - start), abs(stepped_lightness - start))
+
+                stepped_color, stepped_lightness = stepped_tune(color, anchor, 1.70, 1.90)
+                if 1.70 <= gen.contrast_ratio(stepped_color, anchor) <= 1.90:
+                    solution = gen.solve_lightness_for_contrast(color, anchor, 1.70, 1.90)
+                    self.assertTrue(solution["reached"])
+                    self.assertLessEqual(abs(solution["lightness"] - start), abs(stepped_lightness - start))
+
+    def test_shipped_seeds_meet_their_ratio_bounds(self):
+        # Blue's BG_MID sits at 1.703, just above the 1.70 floor.
+        bounds = (
+            ("BG_EDITOR", "BG_DEEP", gen.SURFACE_VALIDATION["sidebar_editor_ratio"]),
+            ("BG_MID", "BG_EDITOR", gen.SURFACE_VALIDATION["editor_mid_ratio"]),
+        )
+        for name, spec in gen.THEME_SPECS.items():
+            with self.subTest(name=name):
+                surfaces = gen.build_surface_roles(spec["surface_seed"])
+                for role, anchor, (minimum_ratio, maximum_ratio) in bounds:
+                    ratio = gen.contrast_ratio(surfaces[role], surfaces[anchor])
+                    self.assertTrue(minimum_ratio <= ratio <= maximum_ratio, f"{role}: {ratio:.3f}")
+                neutrals = gen.neutral_palette(surfaces)
+                for role, key in (("FG_MUTED", "foreground"), ("FG_MAIN", "editor.foreground")):
+                    self.assertGreaterEqual(
+                        gen.contrast_ratio(neutrals[role], surfaces["BG_EDITOR"]),
+                        gen.TEXT_VALIDATION[key]["ratio"],
+                    )
+
+if __name__ == "__main__":
+    unittest.main()
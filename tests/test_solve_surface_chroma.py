@@ -0,0 +1,83 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_themes as gen
+
+DCHROMA_RANGE = gen.SURFACE_VALIDATION["editor_mid_dchroma"]
+RATIO_RANGE = gen.SURFACE_VALIDATION["editor_mid_ratio"]
+
+def mid_arguments(surface_seed):
+    """The (hue, saturation, lightness, BG_EDITOR) solve_surface_roles tunes BG_MID from."""
+    model = gen.RUBY_SURFACE_MODEL
+    hue, saturation, _ = gen.hex_to_hsl(surface_seed)
+    saturation = min(saturation, model["deep_saturation_cap"])
+    bg_editor = gen.solve_surface_roles(hue, saturation)["BG_EDITOR"]
+    return (
+        gen.shift_hue(hue, model["mid_hue_shift"]),
+        gen.clamp(saturation + model["mid_saturation_delta"], 0, 100),
+        model["mid_lightness"],
+        bg_editor,
+    )
+
+class SolveSurfaceChromaTest(unittest.TestCase):
+    def assertInRanges(self, solution, anchor_hex, dchroma_range=DCHROMA_RANGE):
+        ratio = gen.contrast_ratio(solution["color"], anchor_hex)
+        dchroma = gen.oklab_delta(solution["color"], anchor_hex)[1]
+        self.assertTrue(RATIO_RANGE[0] <= ratio <= RATIO_RANGE[1], f"ratio {ratio:.4f}")
+        self.assertTrue(dchroma_range[0] <= dchroma <= dchroma_range[1], f"dchroma {dchroma:.4f}")
+        self.assertAlmostEqual(solution["ratio"], ratio)
+        self.assertAlmostEqual(solution["dchroma"], dchroma)
+
+    def test_shipped_seeds_land_inside_both_ranges(self):
+        for name, spec in gen.THEME_SPECS.items():
+            with self.subTest(name=name):
+                hue, saturation, lightness, bg_editor = mid_arguments(spec["surface_seed"])
+                solution = gen.solve_surface_chroma(hue, saturation, lightness, bg_editor, DCHROMA_RANGE, RATIO_RANGE)
+                self.assertTrue(solution["reached"])
+                self.assertInRanges(solution, bg_editor)
+                self.assertEqual(gen.build_surface_roles(spec["surface_seed"])["BG_MID"], solution["color"])
+                if solution["exit"] == "in_range":
+                    self.assertEqual(solution["saturation"], saturation)
+
+    def test_minimum_dchroma_is_enforced(self):
+        # At saturation 5 and the contrast band, this BG_MID is almost as chromatic as the editor.
+        bg_editor = "#1e2a3a"
+        hue = gen.hex_to_hsl(bg_editor)[0]
+        start = gen.solve_lightness_for_contrast(gen.hsl_to_hex(hue, 5, 30), bg_editor, *RATIO_RANGE)
+        self.assertLess(gen.oklab_delta(start["color"], bg_editor)[1], DCHROMA_RANGE[0])
+
+        solution = gen.solve_surface_chroma(hue, 5, 30, bg_editor, DCHROMA_RANGE, RATIO_RANGE)
+        self.assertTrue(solution["reached"])
+        self.assertNotEqual(solution["exit"], "in_range")
+        self.assertNotEqual(solution["saturation"], 5)
+        self.assertInRanges(solution, bg_editor)
+
+    def test_raised_minimum_moves_a_shipped_seed(self):
+        hue, saturation, lightness, bg_editor = mid_arguments(gen.THEME_SPECS["Gray"]["surface_seed"])
+        dchroma_range = (0.05, DCHROMA_RANGE[1])
+        solution = gen.solve_surface_chroma(hue, saturation, lightness, bg_editor, dchroma_range, RATIO_RANGE)
+        self.assertTrue(solution["reached"])
+        self.assertGreater(solution["saturation"], saturation)
+        self.assertInRanges(solution, bg_editor, dchroma_range)
+
+    def test_reached_solutions_satisfy_both_ranges(self):
+        rng = random.Random(3)
+        for _ in range(150):
+            surface_seed = gen.hsl_to_hex(rng.uniform(0, 360), rng.uniform(0, 40), rng.uniform(8, 20))
+            hue, saturation, lightness, bg_editor = mid_arguments(surface_seed)
+            solution = gen.solve_surface_chroma(hue, saturation, lightness, bg_editor, DCHROMA_RANGE, RATIO_RANGE)
+            if solution["reached"]:
+                with self.subTest(surface_seed=surface_seed):
+                    self.assertInRanges(solution, bg_editor)
+
+    def test_unreachable_ranges_raise(self):
+        hue, saturation, lightness, bg_editor = mid_arguments(gen.THEME_SPECS["Blue"]["surface_seed"])
+        with self.assertRaisesRegex(ValueError, "cannot reach OKLab dC"):
+            gen.tune_surface_chroma(hue, saturation, lightness, bg_editor, (0.5, 0.6), RATIO_RANGE)
+
+if __name__ == "__main__":
+    unittest.main()